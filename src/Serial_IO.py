@@ -1,6 +1,28 @@
+import queue
+import struct
+import threading
+import time
+from binascii import crc_hqx
+from collections import deque
+
+import numpy as np
+
 from .utils import clamp
 
 
+# Status reported when the controller sends angles without a status field.
+FB_STATUS_DEFAULT = "OK"
+
+# Status byte of a binary F frame -> the name the ASCII 'F,...' line carries.
+# Unknown codes are reported as the number itself.
+FB_STATUS_CODES = {0: "IDLE", 1: "MOVING"}
+FB_STATUS_BYTES = {name: code for code, name in FB_STATUS_CODES.items()}
+
+# One decoded feedback record. seq echoes the last command the controller
+# applied, or -1 when the feedback carries no sequence number.
+FB_DTYPE = np.dtype([("a1", "f8"), ("a2", "f8"), ("a3", "f8"), ("status", "U16"), ("seq", "i4")])
+
+
 def send_T(ser, a1, a2, a3):
     """Send target joint angles to the controller using the 'T' command format."""
     if ser is None:
@@ -16,11 +38,13 @@ def parse_feedback_line(line: str):
     """
     Parse a feedback line from the controller.
 
-    Expected format example:
+    Expected format examples:
       F,90,90,90
+      F,90,90,90,MOVING
 
     Returns:
-      (a1, a2, a3) as floats, or None if the line is invalid.
+      (a1, a2, a3, status), or None if the line is invalid.
+      status is FB_STATUS_DEFAULT when the line carries no status field.
     """
     try:
         line = line.strip()
@@ -33,8 +57,552 @@ def parse_feedback_line(line: str):
                 a1 = float(parts[1])
                 a2 = float(parts[2])
                 a3 = float(parts[3])
-                return (a1, a2, a3)
+                st = parts[4].strip() if len(parts) >= 5 else FB_STATUS_DEFAULT
+                return (a1, a2, a3, st or FB_STATUS_DEFAULT)
 
         return None
     except Exception:
         return None
+
+
+def _records_from_tuples(rows, seqs=None):
+    out = np.empty(len(rows), FB_DTYPE)
+    for i, (a1, a2, a3, st) in enumerate(rows):
+        out[i] = (a1, a2, a3, st, -1 if seqs is None else seqs[i])
+    return out
+
+
+def decode_feedback_chunk(chunk):
+    """
+    Decode every complete 'F' line in a received byte chunk at once.
+
+    The common case (only well-formed F lines, all of the same shape:
+    'F,a1,a2,a3', 'F,a1,a2,a3,status' or 'F,a1,a2,a3,status,seq') is
+    converted column-wise by NumPy; anything else falls back to
+    `parse_feedback_line` for that chunk, without sequence numbers.
+
+    Returns:
+      (records, rest) where records is an FB_DTYPE array and rest is the
+      trailing partial line (bytes) to prepend to the next chunk.
+    """
+    nl = chunk.rfind(b"\n")
+    if nl < 0:
+        return np.empty(0, FB_DTYPE), bytes(chunk)
+    rest = bytes(chunk[nl + 1:])
+    body = bytes(chunk[:nl]).replace(b"\r", b"")
+
+    n = body.count(b"\n") + 1
+    if body.count(b"\nF,") + body.startswith(b"F,") == n:
+        tokens = body.replace(b"\n", b",").split(b",")
+        for width in (6, 5, 4):
+            if len(tokens) == width * n and tokens[0::width].count(b"F") == n:
+                out = np.empty(n, FB_DTYPE)
+                try:
+                    out["a1"] = tokens[1::width]
+                    out["a2"] = tokens[2::width]
+                    out["a3"] = tokens[3::width]
+                    out["seq"] = tokens[5::width] if width == 6 else -1
+                except ValueError:
+                    break
+                out["status"] = tokens[4::width] if width >= 5 else FB_STATUS_DEFAULT
+                return out, rest
+
+    lines = [ln for ln in body.split(b"\n") if ln.startswith(b"F,")]
+    rows = []
+    for ln in lines:
+        fb = parse_feedback_line(ln.decode("utf-8", errors="ignore"))
+        if fb is not None:
+            rows.append(fb)
+    return _records_from_tuples(rows), rest
+
+
+# =========================
+# Binary framed protocol
+# =========================
+# Fixed-size little-endian frames, negotiated at connect time:
+#   T: sync, 'T', seq u16, a1 a2 a3 as int16 centi-degrees, crc16   (12 bytes)
+#   F: sync, 'F', seq u16, a1 a2 a3 as int16 centi-degrees, status u8, crc16   (13 bytes)
+#      (status: see FB_STATUS_CODES)
+# The CRC is CRC-16/CCITT (init 0xFFFF) over everything before it.
+FRAME_SYNC = 0xA5
+FRAME_T = 0x54
+FRAME_F = 0x46
+ANGLE_SCALE = 100
+
+_T_FRAME = struct.Struct("<BBHhhh")
+_F_FRAME = struct.Struct("<BBHhhhB")
+_CRC = struct.Struct("<H")
+T_FRAME_SIZE = _T_FRAME.size + _CRC.size
+F_FRAME_SIZE = _F_FRAME.size + _CRC.size
+
+PROTO_ASCII = "ASCII"
+PROTO_BIN = "BIN"
+
+
+def pack_T_frame(seq, a1, a2, a3) -> bytes:
+    """Build a binary 'T' frame for target joint angles."""
+    body = _T_FRAME.pack(
+        FRAME_SYNC, FRAME_T, seq & 0xFFFF,
+        int(round(clamp(a1) * ANGLE_SCALE)),
+        int(round(clamp(a2) * ANGLE_SCALE)),
+        int(round(clamp(a3) * ANGLE_SCALE)),
+    )
+    return body + _CRC.pack(crc_hqx(body, 0xFFFF))
+
+
+def pack_F_frame(seq, a1, a2, a3, status=0) -> bytes:
+    """Build a binary 'F' feedback frame (controller side, used by tests and benchmarks)."""
+    body = _F_FRAME.pack(
+        FRAME_SYNC, FRAME_F, seq & 0xFFFF,
+        int(round(a1 * ANGLE_SCALE)),
+        int(round(a2 * ANGLE_SCALE)),
+        int(round(a3 * ANGLE_SCALE)),
+        int(status) & 0xFF,
+    )
+    return body + _CRC.pack(crc_hqx(body, 0xFFFF))
+
+
+def unpack_F_frames(buf):
+    """
+    Decode every complete 'F' frame in buf.
+
+    Returns:
+      (frames, consumed, bad) where frames is a list of (a1, a2, a3, status, seq),
+      consumed is the number of leading bytes that can be dropped and bad counts
+      sync bytes rejected by type or CRC.
+    """
+    frames = []
+    bad = 0
+    n = len(buf)
+    i = 0
+    body_size = _F_FRAME.size
+    while True:
+        i = buf.find(FRAME_SYNC, i)
+        if i < 0:
+            return frames, n, bad
+        if n - i < F_FRAME_SIZE:
+            return frames, i, bad
+        end = i + body_size
+        if buf[i + 1] != FRAME_F or crc_hqx(buf[i:end], 0xFFFF) != _CRC.unpack_from(buf, end)[0]:
+            bad += 1
+            i += 1
+            continue
+        _, _, seq, a1, a2, a3, st = _F_FRAME.unpack_from(buf, i)
+        frames.append((a1 / ANGLE_SCALE, a2 / ANGLE_SCALE, a3 / ANGLE_SCALE, st, seq))
+        i = end + _CRC.size
+
+
+def unpack_T_frames(buf):
+    """
+    Decode every complete 'T' frame in buf (controller side, used by the simulator).
+
+    Returns:
+      (frames, consumed, bad) like `unpack_F_frames`, frames as (a1, a2, a3, seq).
+    """
+    frames = []
+    bad = 0
+    n = len(buf)
+    i = 0
+    body_size = _T_FRAME.size
+    while True:
+        i = buf.find(FRAME_SYNC, i)
+        if i < 0:
+            return frames, n, bad
+        if n - i < T_FRAME_SIZE:
+            return frames, i, bad
+        end = i + body_size
+        if buf[i + 1] != FRAME_T or crc_hqx(buf[i:end], 0xFFFF) != _CRC.unpack_from(buf, end)[0]:
+            bad += 1
+            i += 1
+            continue
+        _, _, seq, a1, a2, a3 = _T_FRAME.unpack_from(buf, i)
+        frames.append((a1 / ANGLE_SCALE, a2 / ANGLE_SCALE, a3 / ANGLE_SCALE, seq))
+        i = end + _CRC.size
+
+
+def negotiate_protocol(ser, want=PROTO_BIN, timeout=0.3):
+    """
+    Ask the controller to switch to binary frames with a 'P,BIN' line.
+
+    Returns PROTO_BIN only if the controller answers 'P,BIN,OK' within timeout;
+    any other outcome (old firmware, no reply, error) falls back to PROTO_ASCII.
+    """
+    if ser is None or want != PROTO_BIN:
+        return PROTO_ASCII
+    return PROTO_BIN if _handshake(ser, b"P,BIN\n", b"P,BIN,OK", timeout) else PROTO_ASCII
+
+
+def negotiate_seq_tags(ser, protocol=PROTO_ASCII, timeout=0.3):
+    """
+    Ask the controller whether ASCII 'T' commands may carry a ',seq' field ('P,SEQ').
+
+    True only if the controller answers 'P,SEQ,OK' (it then echoes seq on
+    its F lines); firmware that does not know the probe keeps receiving
+    plain 'T,a1,a2,a3'. Binary frames always carry seq, so nothing is asked.
+    """
+    if ser is None or protocol != PROTO_ASCII:
+        return False
+    return _handshake(ser, b"P,SEQ\n", b"P,SEQ,OK", timeout)
+
+
+def _handshake(ser, request, reply, timeout):
+    try:
+        reset = getattr(ser, "reset_input_buffer", None)
+        if reset is not None:
+            reset()
+        ser.write(request)
+        buf = bytearray()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = ser.read(ser.in_waiting or 1)
+            if data:
+                buf += data
+                if reply in buf:
+                    return True
+    except Exception:
+        pass
+    return False
+
+
+# =========================
+# Round-trip latency
+# =========================
+class LatencyStats:
+    """
+    Rolling window of round-trip latency samples (seconds).
+
+    Samples go into a preallocated ring; percentiles and the histogram are
+    computed over the filled part of the window on demand.
+    """
+
+    def __init__(self, window=1000):
+        self.buf = np.zeros(max(1, int(window)))
+        self.n = 0           # total samples ever added
+        self.last = None
+
+    def add(self, rtt_s):
+        self.buf[self.n % len(self.buf)] = rtt_s
+        self.n += 1
+        self.last = rtt_s
+
+    def samples(self):
+        return self.buf[:min(self.n, len(self.buf))]
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """Percentiles in milliseconds, or None when the window is empty."""
+        xs = self.samples()
+        if not len(xs):
+            return None
+        return tuple(float(v) * 1000.0 for v in np.percentile(xs, qs))
+
+    def histogram(self, bins_ms=(0, 5, 10, 20, 50, 100, 200, 500, 1000)):
+        """Counts per latency bin (ms edges) over the current window."""
+        counts, _ = np.histogram(self.samples() * 1000.0, bins=bins_ms)
+        return counts
+
+    def text(self):
+        p = self.percentiles()
+        if p is None:
+            return "RTT: --"
+        return f"RTT p50={p[0]:.1f} p95={p[1]:.1f} p99={p[2]:.1f} ms"
+
+
+# =========================
+# Background serial engine
+# =========================
+class SerialEngine:
+    """
+    Own the serial port with a reader and a writer thread.
+
+    The reader drains the port into a bytearray, decodes all complete
+    feedback in one batch and publishes the newest sample as
+    `latest = (fb, t_monotonic)`.
+    `latest` is replaced in a single assignment, so the UI loop can read it
+    without locking. Writes are queued and sent by the writer thread, so
+    callers never block on the port. The engine exposes `write()`, so it can
+    be passed to `send_T` in place of the raw port.
+
+    protocol selects the wire format (see `negotiate_protocol`); in PROTO_BIN
+    mode feedback is decoded from 'F' frames and `send_T` emits 'T' frames.
+
+    Every decoded batch is also kept in `history` (the newest history_max
+    batches) so a logger can collect the full-rate feedback with
+    `drain_history()`; ControlLoop does this every tick.
+
+    Commands carry a 16-bit sequence number and their monotonic send time is
+    remembered. In ASCII the number only goes on the wire (a trailing ',seq'
+    field) when seq_tags is set, i.e. after `negotiate_seq_tags` succeeded.
+    When feedback echoes a new sequence number, the round trip is added to
+    `rtt`.
+    """
+
+    def __init__(self, ser, read_size=256, tx_queue_max=64, rx_buf_max=4096,
+                 protocol=PROTO_ASCII, history_max=1024, seq_tags=False, rtt_window=1000):
+        self.ser = ser
+        self.protocol = protocol
+        self.seq_tags = seq_tags
+        self.tx_seq = 0
+        self.rx_seq = None
+        self.tx_times = [None] * 256   # (seq, t_monotonic) indexed by seq & 0xFF
+        self.rtt = LatencyStats(rtt_window)
+        self.read_size = max(1, int(read_size))
+        self.rx_buf_max = max(256, int(rx_buf_max))
+
+        self.rx_buf = bytearray()
+        self.tx_q = queue.Queue(maxsize=max(1, int(tx_queue_max)))
+        self.history = deque(maxlen=max(1, int(history_max)))   # (t_monotonic, FB_DTYPE records)
+
+        self.latest = None       # (feedback tuple, time.monotonic()) or None
+        self.rx_lines = 0
+        self.rx_bad = 0
+        self.rx_overflow = 0
+        self.tx_sent = 0
+        self.tx_dropped = 0
+        self.errors = 0
+
+        self._stop = threading.Event()
+        self._rx_thread = None
+        self._tx_thread = None
+
+    def start(self):
+        if self.ser is None or self._rx_thread is not None:
+            return self
+        self._stop.clear()
+        self._rx_thread = threading.Thread(target=self._rx_loop, name="serial-rx", daemon=True)
+        self._tx_thread = threading.Thread(target=self._tx_loop, name="serial-tx", daemon=True)
+        self._rx_thread.start()
+        self._tx_thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        for th in (self._rx_thread, self._tx_thread):
+            if th is not None:
+                th.join(timeout)
+        self._rx_thread = None
+        self._tx_thread = None
+
+    def write(self, data: bytes) -> bool:
+        """Queue raw bytes for the writer thread. Drops the oldest entry when full."""
+        try:
+            self.tx_q.put_nowait(data)
+            return True
+        except queue.Full:
+            pass
+        try:
+            self.tx_q.get_nowait()
+            self.tx_dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self.tx_q.put_nowait(data)
+            return True
+        except queue.Full:
+            self.tx_dropped += 1
+            return False
+
+    def send_T(self, a1, a2, a3):
+        """Queue a sequence-tagged target command in the negotiated wire format."""
+        seq = self.tx_seq = (self.tx_seq + 1) & 0xFFFF
+        if self.protocol == PROTO_BIN:
+            msg = pack_T_frame(seq, a1, a2, a3)
+        elif self.seq_tags:
+            msg = f"T,{clamp(a1)},{clamp(a2)},{clamp(a3)},{seq}\n".encode("utf-8")
+        else:
+            msg = f"T,{clamp(a1)},{clamp(a2)},{clamp(a3)}\n".encode("utf-8")
+        self.tx_times[seq & 0xFF] = (seq, time.monotonic())
+        return self.write(msg)
+
+    def drain_history(self):
+        """
+        Pop every feedback batch received since the last call.
+
+        Returns:
+          (t, records): per-record receive time (monotonic seconds) and an
+          FB_DTYPE array, both empty when nothing arrived.
+        """
+        ts, recs = [], []
+        while True:
+            try:
+                t, r = self.history.popleft()
+            except IndexError:
+                break
+            ts.append(np.full(len(r), t))
+            recs.append(r)
+        if not recs:
+            return np.empty(0), np.empty(0, FB_DTYPE)
+        return np.concatenate(ts), np.concatenate(recs)
+
+    def feedback_age(self, now=None):
+        """Seconds since the last valid feedback line, or None if none arrived yet."""
+        latest = self.latest
+        if latest is None:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return now - latest[1]
+
+    # ----- threads -----
+    def _rx_loop(self):
+        ser = self.ser
+        while not self._stop.is_set():
+            try:
+                n = ser.in_waiting
+                data = ser.read(min(n, self.read_size) if n else 1)
+            except Exception:
+                self.errors += 1
+                time.sleep(0.05)
+                continue
+            if data:
+                self.feed(data)
+            elif not getattr(ser, "timeout", None):
+                # non-blocking port: avoid a busy spin
+                time.sleep(0.001)
+
+    def _tx_loop(self):
+        ser = self.ser
+        while not self._stop.is_set():
+            try:
+                data = self.tx_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                ser.write(data)
+                self.tx_sent += 1
+            except Exception:
+                self.errors += 1
+
+    def feed(self, data: bytes):
+        """Append received bytes and publish every complete feedback line or frame."""
+        buf = self.rx_buf
+        buf += data
+        if self.protocol == PROTO_BIN:
+            self._feed_frames(buf)
+            return
+        if b"\n" not in data:
+            if len(buf) > self.rx_buf_max:
+                # no newline for a long time: garbage on the line, resync
+                self.rx_overflow += 1
+                del buf[:]
+            return
+        records, rest = decode_feedback_chunk(buf)
+        buf[:] = rest
+        if len(records):
+            self._publish(records)
+
+    def _feed_frames(self, buf):
+        frames, consumed, bad = unpack_F_frames(buf)
+        self.rx_bad += bad
+        if consumed:
+            del buf[:consumed]
+        if frames:
+            rows = [(a1, a2, a3, FB_STATUS_CODES.get(st, str(st))) for (a1, a2, a3, st, _) in frames]
+            self._publish(_records_from_tuples(rows, [f[4] for f in frames]))
+
+    def _match_seq(self, seqs, now):
+        # only sequence numbers that changed within the batch are new echoes
+        new = seqs[np.concatenate(([True], seqs[1:] != seqs[:-1]))]
+        for seq in new.tolist():
+            if seq < 0 or seq == self.rx_seq:
+                continue
+            self.rx_seq = seq
+            slot = self.tx_times[seq & 0xFF]
+            if slot is not None and slot[0] == seq:
+                self.tx_times[seq & 0xFF] = None
+                self.rtt.add(now - slot[1])
+
+    def _publish(self, records):
+        now = time.monotonic()
+        self._match_seq(records["seq"], now)
+        self.rx_lines += len(records)
+        self.history.append((now, records))
+        r = records[-1]
+        self.latest = ((float(r["a1"]), float(r["a2"]), float(r["a3"]), str(r["status"])), now)
+
+
+# =========================
+# Fixed-rate transmit scheduler
+# =========================
+class TxScheduler:
+    """
+    Coalesce target commands and send them at a fixed rate.
+
+    `submit()` only stores the newest target; a sender thread wakes every
+    1/rate_hz seconds and forwards it with `sink.send_T` unless it is within
+    tol_deg of the last sent target on every joint.
+
+    Counters:
+      submitted - calls to submit()
+      coalesced - pending targets replaced by a newer one before sending
+      dropped   - targets skipped as duplicates of the last sent command
+      sent      - commands handed to the sink
+    """
+
+    def __init__(self, sink, rate_hz=50.0, tol_deg=0.25):
+        self.sink = sink
+        self.period = 1.0 / max(1.0, float(rate_hz))
+        self.tol_deg = max(0.0, float(tol_deg))
+
+        self.pending = None
+        self.last_sent = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.sink is None or self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="serial-tx-sched", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def submit(self, a1, a2, a3):
+        """Replace the pending target; never blocks on the port."""
+        with self._lock:
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = (clamp(a1), clamp(a2), clamp(a3))
+            self.submitted += 1
+
+    def flush(self):
+        """Send the pending target now (if any, and not a duplicate)."""
+        with self._lock:
+            cmd = self.pending
+            self.pending = None
+        if cmd is None or self.sink is None:
+            return
+        last = self.last_sent
+        if last is not None and all(abs(c - l) <= self.tol_deg for c, l in zip(cmd, last)):
+            self.dropped += 1
+            return
+        self.sink.send_T(cmd[0], cmd[1], cmd[2])
+        self.last_sent = cmd
+        self.sent += 1
+
+    def stats_text(self):
+        return f"TX sent={self.sent} coalesced={self.coalesced} dup={self.dropped}"
+
+    def _loop(self):
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            next_t += self.period
+            self.flush()
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # fell behind (e.g. suspended); restart the grid instead of bursting
+                next_t = time.monotonic()
@@ -0,0 +1,272 @@
+import argparse
+import time
+
+from .Serial_IO import (
+    parse_feedback_line, decode_feedback_chunk, pack_T_frame, pack_F_frame, unpack_F_frames,
+)
+from .sim_controller import SimSerial
+from .Serial_IO import SerialEngine, negotiate_protocol, negotiate_seq_tags
+from .utils import clamp
+
+
+BAUD = 115200
+BITS_PER_BYTE = 10   # 8N1: start + 8 data + stop
+
+
+def _rate(n, dt):
+    return n / dt if dt > 0 else float("inf")
+
+
+def bench_protocol(n: int = 100_000, baud: int = BAUD):
+    """
+    Compare ASCII and binary encodings for one command/feedback pair.
+
+    Reports host-side encode/decode rates and the link-bound pair rate,
+    i.e. how many T+F exchanges per second fit through the serial line.
+    """
+    angles = [(90.0 + (i % 90) * 0.5, 45.25 + (i % 30), 120.75 - (i % 60)) for i in range(1000)]
+
+    # --- encode T ---
+    t0 = time.perf_counter()
+    for i in range(n):
+        a1, a2, a3 = angles[i % 1000]
+        f"T,{clamp(a1)},{clamp(a2)},{clamp(a3)}\n".encode("utf-8")
+    ascii_enc = _rate(n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        a1, a2, a3 = angles[i % 1000]
+        pack_T_frame(i, a1, a2, a3)
+    bin_enc = _rate(n, time.perf_counter() - t0)
+
+    # --- decode F ---
+    ascii_lines = [f"F,{a1},{a2},{a3},OK" for (a1, a2, a3) in angles]
+    t0 = time.perf_counter()
+    for i in range(n):
+        parse_feedback_line(ascii_lines[i % 1000])
+    ascii_dec = _rate(n, time.perf_counter() - t0)
+
+    stream = b"".join(pack_F_frame(i, a1, a2, a3) for i, (a1, a2, a3) in enumerate(angles))
+    reps = max(1, n // 1000)
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        unpack_F_frames(stream)
+    bin_dec = _rate(reps * 1000, time.perf_counter() - t0)
+
+    # --- wire size ---
+    a1, a2, a3 = angles[0]
+    ascii_pair = len(f"T,{a1},{a2},{a3}\n") + len(ascii_lines[0]) + 1
+    bin_pair = len(pack_T_frame(0, a1, a2, a3)) + len(pack_F_frame(0, a1, a2, a3))
+    bytes_per_s = baud / BITS_PER_BYTE
+
+    print(f"=== Protocol throughput ({n} samples, {baud} baud) ===")
+    print(f"{'':10s} {'encode T/s':>12s} {'decode F/s':>12s} {'bytes/pair':>11s} {'link pairs/s':>13s}")
+    print(f"{'ASCII':10s} {ascii_enc:12.0f} {ascii_dec:12.0f} {ascii_pair:11d} {bytes_per_s / ascii_pair:13.0f}")
+    print(f"{'BIN':10s} {bin_enc:12.0f} {bin_dec:12.0f} {bin_pair:11d} {bytes_per_s / bin_pair:13.0f}")
+
+
+def bench_feedback(n: int = 100_000, chunk_lines: int = 64):
+    """
+    Compare per-line parsing against batch chunk decoding of ASCII feedback.
+
+    chunk_lines approximates how many lines a reader pass sees at a 1 kHz
+    telemetry rate (64 lines ~ 64 ms of backlog).
+    """
+    lines = [f"F,{90 + (i % 90) * 0.5},{45.25 + (i % 30)},{120.75 - (i % 60)},OK\n" for i in range(chunk_lines)]
+    chunk = "".join(lines).encode("utf-8") + b"F,90.0,4"
+    reps = max(1, n // chunk_lines)
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        buf = chunk.decode("utf-8", errors="ignore")
+        while "\n" in buf:
+            line, buf = buf.split("\n", 1)
+            parse_feedback_line(line)
+    per_line = _rate(reps * chunk_lines, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        decode_feedback_chunk(chunk)
+    batch = _rate(reps * chunk_lines, time.perf_counter() - t0)
+
+    print(f"=== Feedback decode ({reps * chunk_lines} lines, {chunk_lines} lines/chunk) ===")
+    print(f"per-line split+parse : {per_line:12.0f} lines/s")
+    print(f"batch chunk decode   : {batch:12.0f} lines/s  ({batch / per_line:.1f}x)")
+
+
+def bench_loop(seconds: float = 5.0, protocol: str = "ASCII", step_hz: float = 1.0, **sim_kwargs):
+    """
+    Closed-loop benchmark against the simulated controller.
+
+    Sends a square-wave target on A1 and measures, per step, the time until
+    feedback first moves toward the new target (command->feedback latency)
+    and until it settles within 1 deg, plus feedback throughput.
+    """
+    ser = SimSerial(timeout=0.005, **sim_kwargs)
+    proto = negotiate_protocol(ser, protocol)
+    sio = SerialEngine(ser, protocol=proto, seq_tags=negotiate_seq_tags(ser, proto)).start()
+
+    lat, settle = [], []
+    period = 1.0 / step_hz
+    lo, hi = 60.0, 120.0
+    t_end = time.monotonic() + seconds
+    k = 0
+    while time.monotonic() < t_end:
+        goal = hi if k % 2 == 0 else lo
+        k += 1
+        base = sio.latest[0][0] if sio.latest else 90.0
+        t0 = time.monotonic()
+        sio.send_T(goal, 90, 90)
+        t_first = t_settle = None
+        seen = None
+        while time.monotonic() - t0 < period:
+            latest = sio.latest
+            if latest is not None and latest is not seen:
+                seen = latest
+                a1 = latest[0][0]
+                if t_first is None and abs(a1 - base) > 0.05 and (a1 - base) * (goal - base) > 0:
+                    t_first = latest[1] - t0
+                if t_settle is None and abs(a1 - goal) < 1.0:
+                    t_settle = latest[1] - t0
+            time.sleep(0.0005)
+        if t_first is not None:
+            lat.append(t_first)
+        if t_settle is not None:
+            settle.append(t_settle)
+
+    sio.stop()
+    ser.close()
+
+    def pct(xs, q):
+        if not xs:
+            return float("nan")
+        xs = sorted(xs)
+        return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000.0
+
+    print(f"=== Closed loop vs simulator ({proto}, {seconds:.0f}s, {k} steps) ===")
+    print(f"cmd->first feedback : p50={pct(lat, 0.5):7.2f} ms  p95={pct(lat, 0.95):7.2f} ms  (n={len(lat)})")
+    print(f"cmd->settled (1deg) : p50={pct(settle, 0.5):7.2f} ms  p95={pct(settle, 0.95):7.2f} ms  (n={len(settle)})")
+    print(f"feedback throughput : {sio.rx_lines / seconds:7.1f} samples/s, sent={sio.tx_sent}, tx_dropped={sio.tx_dropped}")
+
+
+def bench_motion(n: int = 500, w: int = 360, h: int = 270, downscale: float = 0.5):
+    """Per-frame cost of MotionDetector on synthetic frames with a moving square."""
+    import numpy as np
+    from .ui_kinematics import MotionDetector
+
+    det = MotionDetector(w, h, thresh=25, min_area=900, downscale=downscale)
+    frames = []
+    for k in range(8):
+        f = np.full((h, w, 3), 40, np.uint8)
+        x = 40 + 30 * k
+        f[100:160, x:x + 60] = 220
+        frames.append(f)
+
+    det.detect(frames[0])
+    hits = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        if det.detect(frames[i % len(frames)]) is not None:
+            hits += 1
+    dt = (time.perf_counter() - t0) / n
+
+    print(f"=== Motion detector ({w}x{h}, downscale={downscale}) ===")
+    print(f"per frame : {dt * 1000:.3f} ms  ({dt * 25 * 100:.1f}% of a 25 FPS budget)")
+    print(f"detections: {hits}/{n}")
+
+
+def bench_marker(n: int = 300, w: int = 1280, h: int = 720):
+    """Per-frame cost of MarkerTracker with the predicted window vs a full-frame search."""
+    import numpy as np
+    from .ui_kinematics import MarkerTracker
+
+    frames = []
+    for k in range(100):
+        f = np.zeros((h, w, 3), np.uint8)
+        x, y = 100 + 10 * k, 200 + 3 * k
+        f[y - 8:y + 8, x - 8:x + 8] = (0, 200, 0)
+        frames.append(f)
+
+    def run(full):
+        tr = MarkerTracker(w, h, "green")
+        t0 = time.perf_counter()
+        for i in range(n):
+            if full:
+                tr.center = None
+            tr.track(frames[i % len(frames)], i * 0.04)
+        return (time.perf_counter() - t0) / n, tr.roi
+
+    roi_dt, roi = run(False)
+    full_dt, _ = run(True)
+    print(f"=== Marker tracker ({w}x{h}) ===")
+    print(f"predicted window : {roi_dt * 1000:.3f} ms/frame  (last roi {roi[2]}x{roi[3]})")
+    print(f"full-frame search: {full_dt * 1000:.3f} ms/frame  ({full_dt / roi_dt:.1f}x)")
+
+
+def bench_frame(n: int = 500, src_w: int = 640, src_h: int = 480, w: int = 360, h: int = 270):
+    """
+    Camera frame path: the previous resize/copy/rot90/make_surface chain
+    against CameraPanel.present, timing and traced allocations per frame.
+    """
+    import tracemalloc
+    import cv2
+    import numpy as np
+    import pygame
+    from .ui_kinematics import CameraPanel
+
+    frames = [np.random.randint(0, 255, (src_h, src_w, 3), np.uint8) for _ in range(4)]
+
+    def old(frame):
+        frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        raw = frame.copy()
+        rgb = cv2.cvtColor(raw, cv2.COLOR_BGR2RGB)
+        return pygame.surfarray.make_surface(np.rot90(rgb))
+
+    cam = CameraPanel(w, h, enable=False)
+    cam.present(frames[0])
+
+    def run(fn):
+        fn(frames[0])
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(frames[i % len(frames)])
+        dt = (time.perf_counter() - t0) / n
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return dt, peak
+
+    old_dt, old_peak = run(old)
+    new_dt, new_peak = run(cam.present)
+    print(f"=== Camera frame path ({src_w}x{src_h} -> {w}x{h}) ===")
+    print(f"copy path      : {old_dt * 1e6:8.1f} us/frame  peak traced alloc {old_peak / 1024:8.1f} KiB")
+    print(f"zero-copy path : {new_dt * 1e6:8.1f} us/frame  peak traced alloc {new_peak / 1024:8.1f} KiB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Micro-benchmarks for the control stack.")
+    ap.add_argument("which", choices=["protocol", "feedback", "loop", "motion", "marker", "frame"], nargs="?", default="protocol")
+    ap.add_argument("-n", type=int, default=100_000)
+    ap.add_argument("--seconds", type=float, default=5.0, help="loop: run time")
+    ap.add_argument("--proto", default="ASCII", choices=["ASCII", "BIN"], help="loop: wire format")
+    ap.add_argument("--latency", type=float, default=0.005, help="loop: simulated one-way latency, s")
+    ap.add_argument("--jitter", type=float, default=0.002, help="loop: simulated jitter, s")
+    ap.add_argument("--loss", type=float, default=0.0, help="loop: simulated packet loss")
+    args = ap.parse_args()
+
+    if args.which == "protocol":
+        bench_protocol(args.n)
+    elif args.which == "feedback":
+        bench_feedback(args.n)
+    elif args.which == "motion":
+        bench_motion(min(args.n, 2000))
+    elif args.which == "marker":
+        bench_marker(min(args.n, 1000))
+    elif args.which == "frame":
+        bench_frame(min(args.n, 2000))
+    elif args.which == "loop":
+        bench_loop(args.seconds, args.proto, latency_s=args.latency, jitter_s=args.jitter, loss=args.loss)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Settings shared by the UI (main.py) and the headless runner (headless.py).
+
+Edit the values here; both entry points import them, so a headless run
+uses the same port, camera, control and log settings as the window.
+"""
+
+# ---------- Optional libs ----------
+HAS_SERIAL = True
+try:
+    import serial
+except Exception:
+    HAS_SERIAL = False
+
+# =========================
+# CONFIG
+# =========================
+PORT = "COM4"                # "SIM" = in-process simulated controller (no hardware)
+BAUD = 115200
+SERIAL_READ_TIMEOUT = 0.02   # reader thread blocks at most this long per read
+FEEDBACK_LOST_S = 1.2
+SERIAL_PROTOCOL = "ASCII"   # "BIN" = request binary frames at connect (falls back to ASCII)
+TX_RATE_HZ = 50              # command rate; keep below link and servo bandwidth
+TX_TOL_DEG = 0.25            # targets closer than this to the last sent one are dropped
+
+ENABLE_SERIAL_DRIVE = True   # ✅ UI=False
+ENABLE_CAMERA = True         # No Opencv = False
+
+W, H = 1280, 820
+FPS = 30                     # UI frame rate; control runs on its own thread at CONTROL_HZ
+CONTROL_HZ = 200             # feedback -> vision -> target -> TX -> log rate
+GIL_SWITCH_S = 0.001         # interpreter thread switch interval (default 5 ms would show up as control jitter)
+
+CAM_W, CAM_H = 360, 270
+CAM_FPS_LIMIT = 25
+CAM_INDEX_CANDIDATES = [0, 1, 2, 3]
+VISION_PROCESS = False       # True = capture + detection in a separate process
+
+
+# Motion / Marker 
+A3_DEFAULT = 90
+MANUAL_STEP_A3_PER_WHEEL = 2
+
+# Motion
+MOTION_DIFF_THRESH = 25      # More STABLE MEANS THE VALUE IS BIG（更稳）
+MOTION_MIN_AREA = 900        
+MOTION_DOWNSCALE = 0.5       # Avoid
+
+
+A1_MIN, A1_MAX = 0, 180
+A2_MIN, A2_MAX = 0, 180
+
+
+CONTROL_MAP = "LINEAR"       # "LINEAR" (centroid -> A1/A2 directly) or "IK" (end effector follows the centroid); K toggles
+DEADBAND_PX = 6              
+EMA_ALPHA = 0.25             
+RATE_LIMIT_DEG = 2           
+
+# Marker
+TRACK_COLOR = "green"        # "green" or "red"
+MARKER_MIN_AREA = 60         # px; smaller blobs count as a miss
+MARKER_ROI_HALF = 48         # px; half-size of the predicted search window
+TRACE_MAX = 600              # camera trace points (fixed-size ring buffers; tens of thousands are fine)
+EE_TRACE_MAX = 900           # end-effector trace points
+
+# Log
+LOG_DIR = "logs"
+LOG_FORMAT = "csv"           # "csv" or "bin" (memory-mappable records, see runlog.py)
+LOG_ASYNC = True             # write from a background thread; the loop only enqueues
+LOG_OVERFLOW = "drop_oldest" # "block", "drop_oldest" or "drop_newest" when the log queue is full
+LOG_FLUSH_S = 0.5
+LOG_ROTATE_MB = 0            # start a new log segment after this many MB (0 = one file per run)
+LOG_ROTATE_S = 0             # ... or after this many seconds (0 = off)
+LOG_COMPRESS = None          # None, "gzip" or "lzma": compress closed segments in the background
+LOG_FEEDBACK = True          # also write every feedback sample (not just one per tick) to logs/fb_<ts>.rlog
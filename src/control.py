@@ -0,0 +1,320 @@
+import queue
+import threading
+import time
+import traceback
+
+from .kinematics import IKGrid
+from .loop_timing import RateLoop
+from .utils import clamp
+
+
+# =========================
+# Vision -> joint target
+# =========================
+class VisionController:
+    """
+    Turns camera centroids into joint targets (shared by the UI and headless runs).
+
+    update(cx, cy) applies the pixel deadband against the last accepted
+    centroid, EMA-smooths it, maps it to angles (LINEAR: A1/A2 straight from
+    the image axes, IK: end effector follows the centroid via IKGrid) and
+    rate-limits the step per accepted centroid. In IK mode a centroid the
+    arm cannot reach holds the current target (see reachable / unreachable).
+    A repeated centroid (no new camera frame) falls inside the deadband, so
+    the result does not depend on how often update() is called.
+
+    target is a list mutated in place; callers may hold a reference to it.
+    """
+
+    def __init__(self, cal, cam_w, cam_h, a1_range=(0, 180), a2_range=(0, 180),
+                 deadband_px=6, ema_alpha=0.25, rate_limit_deg=2, control_map="LINEAR",
+                 start=(90, 90, 90)):
+        self.cam_w, self.cam_h = int(cam_w), int(cam_h)
+        self.a1_min, self.a1_max = a1_range
+        self.a2_min, self.a2_max = a2_range
+        self.deadband_px = deadband_px
+        self.ema_alpha = ema_alpha
+        self.rate_limit_deg = rate_limit_deg
+        self.control_map = control_map
+        self.ik_grid = IKGrid(cal, self.cam_w, self.cam_h)    # cached under cache/, rebuilt when the calibration changes
+
+        self.target = list(start)
+        self.sm_cx, self.sm_cy = None, None
+        self.last_center = None
+        self.reachable = True        # IK: False while the smoothed centroid is outside the workspace
+        self.unreachable = 0         # IK updates held because of that
+
+    @property
+    def strategy(self):
+        return "B1_IK" if self.control_map == "IK" else "B0_RAW"
+
+    def toggle_map(self):
+        self.control_map = "LINEAR" if self.control_map == "IK" else "IK"
+        self.reachable = True
+
+    def compute_angles_from_center(self, cx, cy):
+        # cx in [0, cam_w], cy in [0, cam_h]
+        # map to A1 (left-right), A2 (up-down)
+        a1 = self.a1_min + (self.a1_max - self.a1_min) * (cx / max(1, self.cam_w))
+        a2 = self.a2_max - (self.a2_max - self.a2_min) * (cy / max(1, self.cam_h))  # up => larger
+        return clamp(a1, self.a1_min, self.a1_max), clamp(a2, self.a2_min, self.a2_max)
+
+    def smooth_and_limit(self, new_a1, new_a2):
+        # rate limit relative to current target
+        lim = self.rate_limit_deg
+        cur_a1, cur_a2 = self.target[0], self.target[1]
+        da1 = max(-lim, min(lim, new_a1 - cur_a1))
+        da2 = max(-lim, min(lim, new_a2 - cur_a2))
+        return clamp(cur_a1 + da1), clamp(cur_a2 + da2)
+
+    def update(self, cx, cy):
+        """Feed one centroid; True if the target moved (and should be sent)."""
+        # deadband vs last_center
+        if self.last_center is None:
+            self.last_center = (cx, cy)
+        lc = self.last_center
+        if abs(cx - lc[0]) < self.deadband_px and abs(cy - lc[1]) < self.deadband_px:
+            return False
+        self.last_center = (cx, cy)
+
+        # EMA smooth on pixel center
+        a = self.ema_alpha
+        if self.sm_cx is None:
+            self.sm_cx, self.sm_cy = float(cx), float(cy)
+        else:
+            self.sm_cx = (1 - a) * self.sm_cx + a * cx
+            self.sm_cy = (1 - a) * self.sm_cy + a * cy
+
+        # to angles
+        target = self.target
+        if self.control_map == "IK":
+            a1_new, a2_new, a3_new, ok = self.ik_grid.lookup(self.sm_cx, self.sm_cy)
+            self.reachable = ok
+            if not ok:
+                # out of reach (or only reachable past a joint limit): hold the
+                # current target instead of driving to the clamped pose
+                self.unreachable += 1
+                return False
+            lim = self.rate_limit_deg
+            da3 = max(-lim, min(lim, a3_new - target[2]))
+            target[2] = clamp(target[2] + da3)
+        else:
+            a1_new, a2_new = self.compute_angles_from_center(self.sm_cx, self.sm_cy)
+        target[0], target[1] = self.smooth_and_limit(a1_new, a2_new)
+        return True
+
+    def smoothed_px(self):
+        """(dx, dy) smoothed centroid as ints for the log, "" before the first update."""
+        if self.sm_cx is None:
+            return "", ""
+        return int(self.sm_cx), int(self.sm_cy)
+
+
+# =========================
+# Fixed-rate control loop
+# =========================
+CONTROL_STAGES = ["feedback", "input", "control", "log", "publish", "idle"]
+
+
+class ControlLoop:
+    """
+    The control path - feedback -> input -> VisionController -> TX -> log -
+    paced by a drift-free RateLoop instead of a frame clock.
+
+    run() ticks on the calling thread; start() runs it on its own thread so
+    drawing, display flips and camera reads cannot delay commands (the UI
+    and headless runs both use start()). Other threads talk to it only
+    through:
+      - feed(center): newest camera centroid (a single attribute store),
+      - post(fn) and the helpers built on it (home, nudge_a3, ...): applied
+        at the top of the next tick, so only the loop mutates its state,
+      - snapshot(): copy of the state published after every tick. The loop
+        fills the back slot without locking; the lock only covers the
+        front/back swap and the reader's copy, both a few microseconds.
+
+    timer must be a StageTimer over CONTROL_STAGES (its columns() go into
+    the run log). Each tick drains sio's feedback history into
+    logger.log_feedback(), so samples between ticks are kept too. hook(now), if given, runs each tick inside "publish".
+    """
+
+    def __init__(self, ctl, timer, sio=None, tx=None, logger=None, rate_hz=200, source_fn=None,
+                 source="VISION", mode="MOTION", vision_on=True, hook=None, spin_s=0.0):
+        self.ctl = ctl
+        self.timer = timer
+        self.sio, self.tx, self.logger = sio, tx, logger
+        self.source_fn = source_fn   # () -> (cx, cy) or None; default: the last feed()
+        self.source = source
+        self.mode = mode
+        self.vision_on = vision_on
+        self.hook = hook
+        self.loop = RateLoop(rate_hz, spin_s=spin_s)
+
+        self.actual = list(ctl.target)
+        self.fb_status = "NO_FB"
+        self.last_fb_ts = 0.0
+        self.error = None
+
+        self._center = None
+        self._rtt_n = 0
+        self._rtt_p95_ms = ""
+        self._cmds = queue.SimpleQueue()
+        self._slots = [{}, {}]
+        self._front = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._publish()
+
+    # ----- other threads -----
+    def feed(self, center):
+        self._center = center
+
+    def post(self, fn):
+        self._cmds.put(fn)
+
+    def send(self):
+        if self.tx is not None:
+            t = self.ctl.target
+            self.tx.submit(t[0], t[1], t[2])
+
+    def home(self):
+        def fn():
+            t = self.ctl.target
+            t[0], t[1] = 90, 90
+            self.send()
+            self.fb_status = "HOME_SENT"
+        self.post(fn)
+
+    def nudge_a3(self, delta):
+        def fn():
+            t = self.ctl.target
+            t[2] = clamp(t[2] + delta)
+            self.send()
+        self.post(fn)
+
+    def toggle_map(self):
+        self.post(self.ctl.toggle_map)
+
+    def set_mode(self, mode):
+        self.post(lambda: setattr(self, "mode", mode))
+
+    def set_vision(self, on):
+        self.post(lambda: setattr(self, "vision_on", on))
+
+    def set_status(self, text):
+        self.post(lambda: setattr(self, "fb_status", text))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._slots[self._front])
+
+    # ----- loop thread -----
+    def _publish(self):
+        snap = self._slots[1 - self._front]
+        snap["target"] = tuple(self.ctl.target)
+        snap["actual"] = tuple(self.actual)
+        snap["fb_status"] = self.fb_status
+        snap["last_fb_ts"] = self.last_fb_ts
+        snap["strategy"] = self.ctl.strategy
+        snap["reachable"] = self.ctl.reachable
+        snap["source"] = self.source if self.vision_on else "IDLE"
+        snap["mode"] = self.mode
+        snap["vision_on"] = self.vision_on
+        snap["ticks"] = self.loop.ticks
+        with self._lock:
+            self._seq += 1
+            snap["seq"] = self._seq
+            self._front = 1 - self._front
+
+    def tick(self):
+        timer = self.timer
+        timer.start()
+        while True:
+            try:
+                self._cmds.get_nowait()()
+            except queue.Empty:
+                break
+
+        # newest sample published by the serial reader thread; everything
+        # received since the last tick goes to the feedback log
+        sio = self.sio
+        if sio is not None:
+            latest = sio.latest
+            if latest is not None and latest[1] != self.last_fb_ts:
+                fb, self.last_fb_ts = latest
+                a1, a2, a3, self.fb_status = fb
+                self.actual = [a1, a2, a3]
+            t_fb, fb_batch = sio.drain_history()
+            if self.logger is not None:
+                self.logger.log_feedback(t_fb, fb_batch)
+        timer.mark("feedback")
+
+        center = None
+        if self.vision_on:
+            center = self.source_fn() if self.source_fn is not None else self._center
+        timer.mark("input")
+
+        dx = ""
+        dy = ""
+        if center is not None and self.ctl.update(center[0], center[1]):
+            dx, dy = self.ctl.smoothed_px()
+            self.send()
+        timer.mark("control")
+
+        if self.logger is not None:
+            rtt_ms, rtt_p95_ms = "", ""
+            if sio is not None and sio.rtt.last is not None:
+                rtt_ms = round(sio.rtt.last * 1000.0, 3)
+                if sio.rtt.n != self._rtt_n:
+                    # the window percentile only changes with a new sample
+                    self._rtt_n = sio.rtt.n
+                    self._rtt_p95_ms = round(sio.rtt.percentiles((95,))[0], 3)
+                rtt_p95_ms = self._rtt_p95_ms
+            # stage timings are those of the previous, completed tick
+            self.logger.log(self.ctl.strategy, self.source if self.vision_on else "IDLE", self.mode,
+                            tuple(self.ctl.target), tuple(self.actual), dx, dy, rtt_ms, rtt_p95_ms,
+                            extra=timer.last_us())
+        timer.mark("log")
+
+        self._publish()
+        if self.hook is not None:
+            self.hook(time.monotonic())
+        timer.mark("publish")
+
+    def run(self, seconds=0.0):
+        """Tick at the loop rate until stop() (or for seconds, if > 0)."""
+        t_end = time.monotonic() + seconds if seconds > 0 else None
+        self.loop.start()
+        try:
+            while not self._stop.is_set():
+                if t_end is not None and time.monotonic() >= t_end:
+                    break
+                self.tick()
+                self.loop.wait()
+                self.timer.mark("idle")
+                self.timer.end()
+        except Exception as e:
+            self.error = e
+            print("CONTROL LOOP ERROR:", repr(e))
+            traceback.print_exc()
+
+    def start(self, seconds=0.0):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(seconds,), name="control-loop", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats_text(self):
+        return f"CONTROL {self.loop.stats_text()}"
@@ -0,0 +1,360 @@
+import argparse
+import json
+import math
+import socket
+import sys
+import threading
+import time
+
+from .utils import load_calibration, CAL_PATH
+from .Serial_IO import SerialEngine, TxScheduler, negotiate_protocol, negotiate_seq_tags
+from .sim_controller import SimSerial
+from .loop_timing import StageTimer
+from .control import CONTROL_STAGES, ControlLoop, VisionController
+from .ui_kinematics import CameraPanel, RunLogger
+from .config import (
+    HAS_SERIAL, PORT, BAUD, SERIAL_READ_TIMEOUT, SERIAL_PROTOCOL, TX_RATE_HZ, TX_TOL_DEG,
+    ENABLE_CAMERA, CAM_W, CAM_H, CAM_FPS_LIMIT, CAM_INDEX_CANDIDATES, VISION_PROCESS,
+    MOTION_DIFF_THRESH, MOTION_MIN_AREA, MOTION_DOWNSCALE, TRACK_COLOR, MARKER_MIN_AREA, MARKER_ROI_HALF,
+    A1_MIN, A1_MAX, A2_MIN, A2_MAX, A3_DEFAULT, CONTROL_MAP, DEADBAND_PX, EMA_ALPHA, RATE_LIMIT_DEG,
+    EE_TRACE_MAX, CONTROL_HZ, GIL_SWITCH_S, LOG_DIR, LOG_FORMAT, LOG_OVERFLOW, LOG_FLUSH_S, LOG_ROTATE_MB,
+    LOG_ROTATE_S, LOG_COMPRESS, LOG_FEEDBACK,
+)
+
+
+# =========================
+# CONFIG
+# =========================
+MIRROR_ADDR = "127.0.0.1:9870"
+MIRROR_HZ = 30               # viewer snapshots per second
+STATUS_S = 5.0               # console status line period (0 = off)
+PATTERN_HZ = 0.2             # synthetic input: Lissajous base frequency
+
+
+# =========================
+# Link / inputs
+# =========================
+def open_link(port, seed=None):
+    """(ser, sio, tx, error) for "SIM", a serial device or "none"."""
+    if not port or port.lower() == "none":
+        return None, None, None, None
+    if port == "SIM":
+        ser = SimSerial(timeout=SERIAL_READ_TIMEOUT, seed=seed)
+    elif not HAS_SERIAL:
+        return None, None, None, "pyserial not installed"
+    else:
+        import serial
+        try:
+            ser = serial.Serial(port, BAUD, timeout=SERIAL_READ_TIMEOUT)
+            time.sleep(1.0)
+        except Exception as e:
+            return None, None, None, str(e)
+    proto = negotiate_protocol(ser, SERIAL_PROTOCOL)
+    sio = SerialEngine(ser, protocol=proto, seq_tags=negotiate_seq_tags(ser, proto)).start()
+    tx = TxScheduler(sio, rate_hz=TX_RATE_HZ, tol_deg=TX_TOL_DEG).start()
+    return ser, sio, tx, None
+
+
+class PatternInput:
+    """
+    Deterministic stand-in for the camera: a Lissajous centroid path.
+
+    Samples are held for one camera frame period, like real detections, so
+    the controller sees the same input sequence at any loop rate.
+    """
+
+    def __init__(self, w, h, hz=PATTERN_HZ, fps=CAM_FPS_LIMIT):
+        self.w, self.h = w, h
+        self.hz = hz
+        self.frame_s = 1.0 / max(1, fps)
+
+    def center(self, t):
+        t = math.floor(t / self.frame_s) * self.frame_s
+        a = 2.0 * math.pi * self.hz * t
+        cx = self.w * (0.5 + 0.4 * math.sin(a))
+        cy = self.h * (0.5 + 0.35 * math.sin(1.5 * a + math.pi / 2))
+        return cx, cy
+
+
+class CameraFeed:
+    """
+    Camera reads on their own thread, like the UI loop in main.py: newest
+    centroid of each new frame goes to ControlLoop.feed(), so a slow grab
+    or detection never runs inside a control tick.
+    """
+
+    def __init__(self, cam, loop, mode="MOTION", poll_s=None):
+        self.cam, self.loop, self.mode = cam, loop, mode
+        self.poll_s = poll_s if poll_s is not None else 0.25 / max(1, cam.fps_limit)
+        self.frames = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        cam = self.cam
+        last_ts = None
+        while not self._stop.is_set():
+            try:
+                cam.update(self.mode)
+                if cam.frame_ts != last_ts:
+                    last_ts = cam.frame_ts
+                    self.frames += 1
+                    self.loop.feed(cam.motion_center if self.mode == "MOTION" else cam.marker_center)
+            except Exception as e:
+                print("[CAM] update error:", repr(e))
+            self._stop.wait(self.poll_s)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="camera-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+
+# =========================
+# State mirror (UDP)
+# =========================
+class StateMirror:
+    """
+    Fire-and-forget JSON snapshots of the control state over UDP.
+
+    At most hz datagrams per second; a send never blocks and errors (no
+    viewer listening, buffer full) are only counted.
+    """
+
+    def __init__(self, addr=MIRROR_ADDR, hz=MIRROR_HZ):
+        host, port = addr.rsplit(":", 1)
+        self.addr = (host, int(port))
+        self.period = 1.0 / max(1e-3, float(hz))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.next_t = 0.0
+        self.sent = 0
+        self.errors = 0
+
+    def due(self, now):
+        return now >= self.next_t
+
+    def send(self, now, state):
+        self.next_t = now + self.period
+        try:
+            self.sock.sendto(json.dumps(state).encode("utf-8"), self.addr)
+            self.sent += 1
+        except OSError:
+            self.errors += 1
+
+    def close(self):
+        self.sock.close()
+
+
+# =========================
+# Headless control loop
+# =========================
+def run(port=PORT, rate_hz=CONTROL_HZ, seconds=0.0, source="camera", mode="MOTION", control_map=CONTROL_MAP,
+        mirror=None, mirror_hz=MIRROR_HZ, seed=None, spin_us=0.0, status_s=STATUS_S, summary_path=None):
+    """
+    ControlLoop at rate_hz on its own thread, with no window and no frame
+    clock; the camera (if any) is read on another thread and this one only
+    waits.
+
+    Runs until seconds have elapsed (0 = until Ctrl+C) and returns a summary
+    dict (loop rate and lateness, stage timings, link and log stats).
+    """
+    cal = load_calibration(CAL_PATH)
+    ser, sio, tx, serial_err = open_link(port, seed)
+    if serial_err:
+        print("[LINK] serial error:", serial_err)
+
+    ctl = VisionController(cal, CAM_W, CAM_H, (A1_MIN, A1_MAX), (A2_MIN, A2_MAX),
+                           deadband_px=DEADBAND_PX, ema_alpha=EMA_ALPHA, rate_limit_deg=RATE_LIMIT_DEG,
+                           control_map=control_map, start=(90, 90, A3_DEFAULT))
+
+    cam = None
+    source_fn = None
+    t_start = time.monotonic()
+    if source == "camera":
+        cam = CameraPanel(CAM_W, CAM_H, fps_limit=CAM_FPS_LIMIT, candidates=CAM_INDEX_CANDIDATES,
+                          enable=ENABLE_CAMERA, motion_thresh=MOTION_DIFF_THRESH, motion_min_area=MOTION_MIN_AREA,
+                          motion_downscale=MOTION_DOWNSCALE, marker_color=TRACK_COLOR,
+                          marker_min_area=MARKER_MIN_AREA, marker_roi_half=MARKER_ROI_HALF,
+                          use_process=VISION_PROCESS)
+        if not cam.ok:
+            print("[CAM] no camera, running without vision input")
+    elif source == "pattern":
+        pattern = PatternInput(CAM_W, CAM_H)
+
+        def source_fn():
+            return pattern.center(time.monotonic() - t_start)
+
+    timer = StageTimer(CONTROL_STAGES, fps=rate_hz, window=max(600, int(rate_hz * 10)))
+    logger = RunLogger(LOG_FORMAT, async_write=True, overflow=LOG_OVERFLOW, flush_interval=LOG_FLUSH_S,
+                       extra_cols=timer.columns(), rotate_mb=LOG_ROTATE_MB, rotate_s=LOG_ROTATE_S,
+                       compress=LOG_COMPRESS, feedback=LOG_FEEDBACK, log_dir=LOG_DIR)
+    print("[LOG] path =", logger.path)
+    mirror = StateMirror(mirror, mirror_hz) if mirror else None
+    next_status = [t_start + status_s if status_s > 0 else None]
+
+    def hook(now):
+        if mirror is not None and mirror.due(now):
+            snap = cl.snapshot()
+            snap.update({"t": time.time(), "loop": cl.loop.stats_text(),
+                         "tx": tx.stats_text() if tx is not None else "",
+                         "rtt": sio.rtt.text() if sio is not None else "", "log": logger.path})
+            mirror.send(now, snap)
+        if next_status[0] is not None and now >= next_status[0]:
+            next_status[0] += status_s
+            print(f"[RUN] {cl.loop.stats_text()}  {logger.stats_text()}")
+
+    cl = ControlLoop(ctl, timer, sio=sio, tx=tx, logger=logger, rate_hz=rate_hz, source_fn=source_fn,
+                     source={"camera": "VISION", "pattern": "PATTERN"}.get(source, "IDLE"), mode=mode,
+                     vision_on=source in ("camera", "pattern"), hook=hook, spin_s=spin_us * 1e-6)
+    sys.setswitchinterval(GIL_SWITCH_S)
+    feed = CameraFeed(cam, cl, mode).start() if cam is not None and cam.ok else None
+    cl.start(seconds)
+    try:
+        while cl.alive():
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    cl.stop()
+    if feed is not None:
+        feed.stop()
+    loop = cl.loop
+
+    summary = {"loop": loop.summary(), "stages_us": {k: dict(zip(("mean", "p95", "max"), (round(v, 1) for v in st)))
+                                                 for k, st in timer.stats().items()},
+               "work_overruns": timer.overruns, "port": port, "source": source, "strategy": ctl.strategy,
+               "ik_unreachable": ctl.unreachable,
+               "log": logger.path, "error": None if cl.error is None else repr(cl.error)}
+    if feed is not None:
+        summary["cam_frames"] = feed.frames
+    if tx is not None:
+        summary["tx"] = tx.stats_text()
+    if sio is not None:
+        p = sio.rtt.percentiles()
+        summary["rtt_ms"] = None if p is None else [round(v, 3) for v in p]
+
+    # cleanup
+    for closer in (cam.close if cam is not None else None, logger.close,
+                   mirror.close if mirror is not None else None,
+                   tx.stop if tx is not None else None, sio.stop if sio is not None else None,
+                   ser.close if ser is not None else None):
+        try:
+            if closer is not None:
+                closer()
+        except Exception:
+            pass
+
+    if summary_path:
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+
+# =========================
+# Viewer
+# =========================
+def view(addr=MIRROR_ADDR, fps=30):
+    """
+    Window that draws the snapshots a headless run mirrors to addr (host:port
+    to bind). The end-effector trace is rebuilt from the received snapshots,
+    so it is only as dense as the mirror rate.
+    """
+    import pygame
+    from .render_cache import RingTrace
+    from .ui_kinematics import draw_virtual_robot
+
+    host, port = addr.rsplit(":", 1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, int(port)))
+    sock.setblocking(False)
+
+    cal = load_calibration(CAL_PATH)
+    pygame.init()
+    pygame.display.set_caption(f"Headless viewer ({addr})")
+    screen = pygame.display.set_mode((900, 640))
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 26)
+    mono = pygame.font.SysFont("consolas", 20)
+
+    state = None
+    last_rx = 0.0
+    ee_trace = RingTrace(EE_TRACE_MAX, min_step=2)
+    fresh = False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+        while True:
+            try:
+                data, _ = sock.recvfrom(65536)
+            except (BlockingIOError, OSError):
+                break
+            try:
+                state = json.loads(data.decode("utf-8"))
+                last_rx = time.monotonic()
+                fresh = True
+            except ValueError:
+                pass
+
+        screen.fill((22, 22, 22))
+        if state is None:
+            screen.blit(font.render(f"waiting for snapshots on {addr} ...", True, (255, 180, 120)), (20, 20))
+        else:
+            age = time.monotonic() - last_rx
+            col = (120, 220, 120) if age < 1.0 else (255, 80, 80)
+            rows = [(f"TARGET {tuple(round(a, 1) for a in state['target'])}   ACTUAL "
+                     f"{tuple(round(a, 1) for a in state['actual'])}   FB {state['fb_status']}", col),
+                    (f"{state['strategy']}  {state['source']}({state['mode']})   age {age:.1f}s", (180, 180, 180)),
+                    (state["loop"], (160, 160, 160)),
+                    (f"{state['tx']}   {state['rtt']}", (160, 160, 160))]
+            for i, (text, c) in enumerate(rows):
+                screen.blit(font.render(text, True, c), (20, 12 + 24 * i))
+            ee = draw_virtual_robot(screen, 20, 120, 860, 500, tuple(state["actual"]), cal, "SIDE", ee_trace, font, mono)
+            if fresh:
+                ee_trace.append(*ee)
+                fresh = False
+        pygame.display.flip()
+        clock.tick(fps)
+
+    sock.close()
+    pygame.quit()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the control loop without the UI window.")
+    ap.add_argument("--port", default=PORT, help='serial device, "SIM" or "none"')
+    ap.add_argument("--rate", type=float, default=CONTROL_HZ, help="control loop rate, Hz")
+    ap.add_argument("--seconds", type=float, default=0.0, help="stop after this long (0 = until Ctrl+C)")
+    ap.add_argument("--input", choices=("camera", "pattern", "none"), default="camera",
+                    help="centroid source: webcam, deterministic Lissajous path, or nothing")
+    ap.add_argument("--mode", choices=("MOTION", "MARKER"), default="MOTION", help="camera detector")
+    ap.add_argument("--map", choices=("LINEAR", "IK"), default=CONTROL_MAP, help="centroid -> joint mapping")
+    ap.add_argument("--mirror", nargs="?", const=MIRROR_ADDR, default=None, metavar="HOST:PORT",
+                    help=f"send state snapshots to a viewer (default {MIRROR_ADDR})")
+    ap.add_argument("--mirror-hz", type=float, default=MIRROR_HZ)
+    ap.add_argument("--seed", type=int, default=None, help="SIM jitter/loss seed")
+    ap.add_argument("--spin-us", type=float, default=0.0, help="busy-wait this long before each deadline")
+    ap.add_argument("--status", type=float, default=STATUS_S, help="console status period, s (0 = off)")
+    ap.add_argument("--summary", default=None, metavar="PATH", help="write the end-of-run summary as JSON")
+    ap.add_argument("--view", nargs="?", const=MIRROR_ADDR, default=None, metavar="HOST:PORT",
+                    help="run the viewer for a mirrored headless run instead")
+    args = ap.parse_args()
+
+    if args.view:
+        view(args.view)
+        return
+    summary = run(port=args.port, rate_hz=args.rate, seconds=args.seconds, source=args.input, mode=args.mode,
+                  control_map=args.map, mirror=args.mirror, mirror_hz=args.mirror_hz, seed=args.seed,
+                  spin_us=args.spin_us, status_s=args.status, summary_path=args.summary)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
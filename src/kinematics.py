@@ -0,0 +1,222 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .utils import DEFAULT_CAL
+
+
+# =========================
+# 3-link planar arm (side view)
+# =========================
+# Screen convention used by the UI: x to the right, y down, angles counter-
+# clockwise from +x. Joint angles are relative (each link is measured from
+# the previous one); the calibration's visual_zero_deg is added to the raw
+# servo angles before any kinematics.
+
+
+def cal_link_lengths(cal):
+    """(l1, l2, l3) in px from a calibration dict."""
+    ll = cal["link_lengths_px"]
+    return (float(ll["l1"]), float(ll["l2"]), float(ll["l3"]))
+
+
+def cal_zero_deg(cal):
+    """(z1, z2, z3) visual zero offsets in degrees from a calibration dict."""
+    vz = cal["visual_zero_deg"]
+    return (float(vz["a1"]), float(vz["a2"]), float(vz["a3"]))
+
+
+def cal_ik(cal):
+    """The calibration's "ik" section, with defaults for missing keys."""
+    ik = dict(DEFAULT_CAL["ik"])
+    ik.update(cal.get("ik", {}))
+    return ik
+
+
+def fk_batch(angles_deg, link_lengths, base_xy=(0.0, 0.0), zero_deg=(0.0, 0.0, 0.0)):
+    """
+    Forward kinematics for many poses at once.
+
+    angles_deg: (..., 3) raw joint angles; zero_deg is added first.
+    Returns (..., 4, 2) float64 positions of base, joint 2, joint 3 and the
+    end effector.
+    """
+    q = np.deg2rad(np.asarray(angles_deg, dtype=np.float64) + np.asarray(zero_deg, dtype=np.float64))
+    th = np.cumsum(q, axis=-1)
+    L = np.asarray(link_lengths, dtype=np.float64)
+    seg = np.stack((L * np.cos(th), -L * np.sin(th)), axis=-1)     # (..., 3, 2)
+    pts = np.empty(q.shape[:-1] + (4, 2))
+    pts[..., 0, :] = base_xy
+    pts[..., 1:, :] = np.cumsum(seg, axis=-2) + np.asarray(base_xy, dtype=np.float64)
+    return pts
+
+
+def fk_ee_batch(angles_deg, link_lengths, base_xy=(0.0, 0.0), zero_deg=(0.0, 0.0, 0.0)):
+    """(..., 2) end-effector positions only (column-wise, no intermediate joints)."""
+    q = np.asarray(angles_deg, dtype=np.float64)
+    z = np.deg2rad(np.asarray(zero_deg, dtype=np.float64))
+    l1, l2, l3 = (float(v) for v in link_lengths)
+    t1 = np.deg2rad(q[..., 0]) + z[0]
+    t2 = t1 + np.deg2rad(q[..., 1]) + z[1]
+    t3 = t2 + np.deg2rad(q[..., 2]) + z[2]
+    out = np.empty(q.shape[:-1] + (2,))
+    out[..., 0] = base_xy[0] + l1 * np.cos(t1) + l2 * np.cos(t2) + l3 * np.cos(t3)
+    out[..., 1] = base_xy[1] - (l1 * np.sin(t1) + l2 * np.sin(t2) + l3 * np.sin(t3))
+    return out
+
+
+def ee_error_batch(target_deg, actual_deg, link_lengths, zero_deg=(0.0, 0.0, 0.0)):
+    """
+    Cartesian end-effector tracking error for (N, 3) target/actual angle arrays.
+
+    Returns (dx, dy, dist) arrays in px (actual - target).
+    """
+    d = fk_ee_batch(actual_deg, link_lengths, zero_deg=zero_deg) - fk_ee_batch(target_deg, link_lengths, zero_deg=zero_deg)
+    return d[..., 0], d[..., 1], np.hypot(d[..., 0], d[..., 1])
+
+
+def fk_points_side(angles_deg, link_lengths_px, base_xy):
+    """Single pose for drawing: (p0, p1, p2, p3, theta1) with angles already offset by visual zero."""
+    pts = fk_batch(angles_deg, link_lengths_px, base_xy)
+    p0, p1, p2, p3 = (tuple(p) for p in pts.tolist())
+    return p0, p1, p2, p3, float(np.deg2rad(angles_deg[0]))
+
+
+# =========================
+# Inverse kinematics
+# =========================
+# The arm has one redundant DOF in the plane, so IK fixes the world angle of
+# the last link (ik.phi_deg, -90 = tool pointing down). Workspace points use
+# robot coordinates: origin at the base, x right, y up (px).
+# Next to the package (repo root), not the working directory; git-ignored.
+IK_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+IK_GRID_VERSION = 1
+
+
+def _wrap_deg(a):
+    return (a + 180.0) % 360.0 - 180.0
+
+
+def ik_batch(points, link_lengths, phi_deg=-90.0, zero_deg=(0.0, 0.0, 0.0), elbow=0, limits=(0.0, 180.0)):
+    """
+    Closed-form IK for many end-effector points at once.
+
+    points: (..., 2) workspace positions. elbow: +1 / -1 picks the sign of
+    the elbow angle, 0 picks whichever solution fits the joint limits.
+    Returns (angles, ok): (..., 3) raw servo angles clamped to limits and a
+    bool mask that is False where the point is out of reach or the pose
+    had to be clamped. Unreachable points get the fully stretched pose
+    towards them.
+    """
+    l1, l2, l3 = (float(v) for v in link_lengths)
+    p = np.asarray(points, dtype=np.float64)
+    phi = np.deg2rad(float(phi_deg))
+    wx = p[..., 0] - l3 * np.cos(phi)
+    wy = p[..., 1] - l3 * np.sin(phi)
+    c2 = (wx * wx + wy * wy - l1 * l1 - l2 * l2) / (2.0 * l1 * l2)
+    reach = (c2 >= -1.0) & (c2 <= 1.0)
+    c2 = np.clip(c2, -1.0, 1.0)
+    s2 = np.sqrt(1.0 - c2 * c2)
+    base = np.arctan2(wy, wx)
+    zero = np.asarray(zero_deg, dtype=np.float64)
+    lo, hi = limits
+
+    sols = []
+    for sign in (1.0, -1.0):
+        q2 = np.arctan2(sign * s2, c2)
+        q1 = base - np.arctan2(l2 * sign * s2, l1 + l2 * c2)
+        q3 = phi - q1 - q2
+        raw = _wrap_deg(np.rad2deg(np.stack((q1, q2, q3), axis=-1)) - zero)
+        sols.append((raw, np.all((raw >= lo) & (raw <= hi), axis=-1)))
+
+    (pos, pos_ok), (neg, neg_ok) = sols
+    if elbow > 0:
+        raw, within = pos, pos_ok
+    elif elbow < 0:
+        raw, within = neg, neg_ok
+    else:
+        use_neg = ~pos_ok & neg_ok
+        raw = np.where(use_neg[..., None], neg, pos)
+        within = pos_ok | neg_ok
+    return np.clip(raw, lo, hi), reach & within
+
+
+def cam_to_workspace(cx, cy, cam_w, cam_h, ik):
+    """Map camera pixels linearly onto the ik x/y workspace rectangle (image up = robot up)."""
+    (x0, x1), (y0, y1) = ik["x_range_px"], ik["y_range_px"]
+    u = np.asarray(cx, dtype=np.float64) / max(1, cam_w)
+    v = np.asarray(cy, dtype=np.float64) / max(1, cam_h)
+    return np.stack((x0 + (x1 - x0) * u, y1 - (y1 - y0) * v), axis=-1)
+
+
+class IKGrid:
+    """
+    Precomputed camera-pixel -> joint-angle table for the IK control mode.
+
+    The table covers the camera image every ik.grid_step_px pixels and is
+    stored as cache/ik_grid_<key>.npz, where key hashes everything the
+    result depends on (link lengths, visual zero, ik section, camera size);
+    editing the calibration therefore selects a fresh table and stale ones
+    are deleted. lookup() is a nearest-cell read from nested lists.
+    """
+
+    def __init__(self, cal, cam_w, cam_h, cache_dir=IK_CACHE_DIR):
+        self.cam_w, self.cam_h = int(cam_w), int(cam_h)
+        self.ik = cal_ik(cal)
+        self.links = cal_link_lengths(cal)
+        self.zero = cal_zero_deg(cal)
+        self.step = max(1, int(self.ik["grid_step_px"]))
+        self.key = self.cache_key()
+        self.path = os.path.join(cache_dir, f"ik_grid_{self.key}.npz")
+        self.loaded = False
+
+        table = ok = None
+        try:
+            with np.load(self.path) as z:
+                table, ok = z["angles"], z["ok"]
+            self.loaded = True
+        except Exception:
+            table, ok = self.build()
+            self._save(cache_dir, table, ok)
+        self.angles, self.ok = table, ok
+        self._rows = table.tolist()
+        self._ok_rows = ok.tolist()
+        self._inv = 1.0 / self.step
+        self._ni, self._nj = table.shape[0] - 1, table.shape[1] - 1
+
+    def cache_key(self):
+        blob = json.dumps({"v": IK_GRID_VERSION, "links": self.links, "zero": self.zero, "ik": self.ik,
+                           "cam": [self.cam_w, self.cam_h]}, sort_keys=True)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+    def build(self):
+        xs = np.arange(0, self.cam_w + self.step, self.step, dtype=np.float64)
+        ys = np.arange(0, self.cam_h + self.step, self.step, dtype=np.float64)
+        gx, gy = np.meshgrid(xs, ys)
+        pts = cam_to_workspace(gx, gy, self.cam_w, self.cam_h, self.ik)
+        angles, ok = ik_batch(pts, self.links, self.ik["phi_deg"], self.zero, int(self.ik["elbow"]))
+        return angles.astype(np.float32), ok
+
+    def _save(self, cache_dir, table, ok):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            for old in glob.glob(os.path.join(cache_dir, "ik_grid_*.npz")):
+                if old != self.path:
+                    os.remove(old)
+            tmp = self.path + ".tmp.npz"
+            np.savez(tmp, angles=table, ok=ok)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def lookup(self, cx, cy):
+        """(a1, a2, a3, reachable) for a camera pixel."""
+        i = int(cy * self._inv + 0.5)
+        j = int(cx * self._inv + 0.5)
+        i = 0 if i < 0 else (self._ni if i > self._ni else i)
+        j = 0 if j < 0 else (self._nj if j > self._nj else j)
+        a1, a2, a3 = self._rows[i][j]
+        return a1, a2, a3, self._ok_rows[i][j]
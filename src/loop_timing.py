@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+
+
+# =========================
+# Per-stage loop timing
+# =========================
+class StageTimer:
+    """
+    Record how long each stage of a loop iteration takes.
+
+    Call `start()` at the top of the iteration, `mark(stage)` after each
+    stage (time since the previous mark is charged to that stage, via
+    perf_counter_ns) and `end()` once per iteration. Stages listed in idle
+    (e.g. the frame-rate sleep) are timed but excluded from the work total
+    that is checked against the 1/fps budget.
+
+    The last `window` iterations are kept for mean / p95 / max statistics.
+    """
+
+    def __init__(self, stages, fps=60, window=600, idle=("idle",)):
+        self.stages = list(stages)
+        self.idx = {s: i for i, s in enumerate(self.stages)}
+        self.work_mask = np.array([s not in idle for s in self.stages])
+        self.budget_ns = int(1e9 / max(1, fps))
+        self.window = max(1, int(window))
+
+        self.hist = np.zeros((self.window, len(self.stages)), np.int64)
+        self.work = np.zeros(self.window, np.int64)
+        self.cur = [0] * len(self.stages)
+        self.last = [0] * len(self.stages)
+        self.last_work = 0
+        self.n = 0
+        self.overruns = 0
+        self._t = 0
+
+    def start(self):
+        for i in range(len(self.cur)):
+            self.cur[i] = 0
+        self._t = time.perf_counter_ns()
+
+    def mark(self, stage):
+        now = time.perf_counter_ns()
+        self.cur[self.idx[stage]] += now - self._t
+        self._t = now
+
+    def end(self):
+        row = self.n % self.window
+        self.hist[row] = self.cur
+        work = int(self.hist[row][self.work_mask].sum())
+        self.work[row] = work
+        if work > self.budget_ns:
+            self.overruns += 1
+        self.last = list(self.cur)
+        self.last_work = work
+        self.n += 1
+
+    def columns(self):
+        """Log column names matching `last_us()`."""
+        return [f"dt_{s}_us" for s in self.stages] + ["dt_work_us"]
+
+    def last_us(self):
+        """Stage durations of the last completed iteration in microseconds (for logging)."""
+        return [round(v / 1000.0, 1) for v in self.last] + [round(self.last_work / 1000.0, 1)]
+
+    def stats(self):
+        """{stage: (mean_us, p95_us, max_us)} over the window, plus 'work'."""
+        k = min(self.n, self.window)
+        if k == 0:
+            return {}
+        h = self.hist[:k] / 1000.0
+        out = {}
+        for i, s in enumerate(self.stages):
+            col = h[:, i]
+            out[s] = (float(col.mean()), float(np.percentile(col, 95)), float(col.max()))
+        w = self.work[:k] / 1000.0
+        out["work"] = (float(w.mean()), float(np.percentile(w, 95)), float(w.max()))
+        return out
+
+    def lines(self):
+        """Text rows for an on-screen overlay."""
+        st = self.stats()
+        if not st:
+            return ["timing: --"]
+        rows = [f"{'stage':9s} {'mean':>7s} {'p95':>7s} {'max':>7s}  us"]
+        for s, (mean, p95, mx) in st.items():
+            rows.append(f"{s:9s} {mean:7.0f} {p95:7.0f} {mx:7.0f}")
+        rows.append(f"budget {self.budget_ns / 1000:.0f} us  overruns {self.overruns}/{self.n}")
+        return rows
+
+
+# =========================
+# Fixed-rate pacing
+# =========================
+class RateLoop:
+    """
+    Drift-free fixed-period pacing for loops running faster than a frame clock.
+
+    Deadlines are start + k * period, so sleep overshoot in one iteration is
+    absorbed by the next instead of accumulating. wait() sleeps to the next
+    deadline and returns how late it woke up (s). If an iteration overran
+    its deadline it counts a miss; if the loop fell more than max_behind
+    periods back, the missed ticks are skipped (counted in skipped) rather
+    than run back-to-back. spin_s busy-waits the last bit before a deadline
+    for lower jitter at the cost of CPU.
+    """
+
+    def __init__(self, hz, max_behind=2, spin_s=0.0, window=2000):
+        self.period = 1.0 / max(1e-3, float(hz))
+        self.max_behind = max(1, int(max_behind))
+        self.spin_s = max(0.0, float(spin_s))
+        self.window = max(1, int(window))
+        self.late = np.zeros(self.window)
+        self.ticks = 0
+        self.misses = 0
+        self.skipped = 0
+        self.t0 = None
+        self.next_t = None
+
+    def start(self):
+        self.t0 = time.perf_counter()
+        self.next_t = self.t0 + self.period
+        return self
+
+    def wait(self):
+        if self.next_t is None:
+            self.start()
+        now = time.perf_counter()
+        if now > self.next_t:
+            self.misses += 1
+            behind = int((now - self.next_t) / self.period)
+            if behind >= self.max_behind:
+                self.skipped += behind
+                self.next_t += behind * self.period
+        else:
+            rest = self.next_t - now - self.spin_s
+            if rest > 0:
+                time.sleep(rest)
+            while time.perf_counter() < self.next_t:
+                pass
+            now = time.perf_counter()
+        late = now - self.next_t
+        self.late[self.ticks % self.window] = late
+        self.ticks += 1
+        self.next_t += self.period
+        return late
+
+    def rate(self):
+        """Achieved iterations per second since start()."""
+        if self.t0 is None or self.ticks == 0:
+            return 0.0
+        return self.ticks / max(1e-9, time.perf_counter() - self.t0)
+
+    def summary(self):
+        """Rate and wake-up lateness (us) over the window, as a flat dict."""
+        k = min(self.ticks, self.window)
+        late_us = self.late[:k] * 1e6 if k else np.zeros(1)
+        p50, p99 = np.percentile(late_us, (50, 99))
+        return {"hz": round(1.0 / self.period, 3), "rate_hz": round(self.rate(), 3), "ticks": self.ticks,
+                "misses": self.misses, "skipped": self.skipped,
+                "late_p50_us": round(float(p50), 1), "late_p99_us": round(float(p99), 1),
+                "late_max_us": round(float(late_us.max()), 1)}
+
+    def stats_text(self):
+        if self.ticks == 0:
+            return "rate: --"
+        s = self.summary()
+        return (f"rate {s['rate_hz']:.1f}/{s['hz']:.0f} Hz  late p50={s['late_p50_us']:.0f} "
+                f"p99={s['late_p99_us']:.0f} max={s['late_max_us']:.0f} us  "
+                f"miss={s['misses']} skip={s['skipped']}")
@@ -1,9 +1,24 @@
 import os, sys, time, json, csv
-import numpy as np
 
 from .utils import load_calibration, save_calibration, DEFAULT_CAL, CAL_PATH
-from .Serial_IO import send_T, parse_feedback_line
-from .ui_kinematics import CameraPanel, RunLogger, fk_points_side, draw_virtual_robot
+from .Serial_IO import SerialEngine, TxScheduler, negotiate_protocol, negotiate_seq_tags
+from .sim_controller import SimSerial
+from .loop_timing import StageTimer
+from .control import CONTROL_STAGES, ControlLoop, VisionController
+from .ui_kinematics import (
+    CameraPanel, RunLogger, rot90_coord, draw_panel_border,
+    robot_geometry, draw_robot_static, draw_ee_trace, draw_robot_arm, robot_labels,
+)
+from .render_cache import DirtyScreen, RingTrace, draw_trace
+from .config import (
+    HAS_SERIAL, PORT, BAUD, SERIAL_READ_TIMEOUT, FEEDBACK_LOST_S, SERIAL_PROTOCOL, TX_RATE_HZ, TX_TOL_DEG,
+    ENABLE_SERIAL_DRIVE, ENABLE_CAMERA, W, H, FPS, CONTROL_HZ, GIL_SWITCH_S,
+    CAM_W, CAM_H, CAM_FPS_LIMIT, CAM_INDEX_CANDIDATES, VISION_PROCESS, A3_DEFAULT, MANUAL_STEP_A3_PER_WHEEL,
+    MOTION_DIFF_THRESH, MOTION_MIN_AREA, MOTION_DOWNSCALE, A1_MIN, A1_MAX, A2_MIN, A2_MAX,
+    CONTROL_MAP, DEADBAND_PX, EMA_ALPHA, RATE_LIMIT_DEG, TRACK_COLOR, MARKER_MIN_AREA, MARKER_ROI_HALF,
+    TRACE_MAX, EE_TRACE_MAX, LOG_FORMAT, LOG_ASYNC, LOG_OVERFLOW, LOG_FLUSH_S, LOG_ROTATE_MB, LOG_ROTATE_S,
+    LOG_COMPRESS, LOG_FEEDBACK, LOG_DIR,
+)
 
 
 Button = CameraPanel.Button
@@ -11,12 +26,6 @@ Button = CameraPanel.Button
 
 
 # ---------- Optional libs ----------
-HAS_SERIAL = True
-try:
-    import serial
-except Exception:
-    HAS_SERIAL = False
-
 HAS_CV2 = True
 try:
     import cv2
@@ -25,170 +34,6 @@ except Exception:
 
 import pygame
 
-# =========================
-# CONFIG 
-# =========================
-PORT = "COM4"
-BAUD = 115200
-
-ENABLE_SERIAL_DRIVE = True   # ✅ UI=False
-ENABLE_CAMERA = True         # No Opencv = False
-
-W, H = 1280, 820
-FPS = 60
-
-CAM_W, CAM_H = 360, 270
-CAM_FPS_LIMIT = 25
-CAM_INDEX_CANDIDATES = [0, 1, 2, 3]
-
-
-# Motion / Marker 
-A3_DEFAULT = 90
-MANUAL_STEP_A3_PER_WHEEL = 2
-
-# Motion
-MOTION_DIFF_THRESH = 25      # More STABLE MEANS THE VALUE IS BIG（更稳）
-MOTION_MIN_AREA = 900        
-MOTION_DOWNSCALE = 0.5       # Avoid
-
-
-A1_MIN, A1_MAX = 0, 180
-A2_MIN, A2_MAX = 0, 180
-
-
-DEADBAND_PX = 6              
-EMA_ALPHA = 0.25             
-RATE_LIMIT_DEG = 2           
-
-# Marker
-TRACK_COLOR = "green"        # "green" or "red"
-TRACE_MAX = 600
-
-# Log
-LOG_DIR = "logs"
-
-# 2D
-DEFAULT_CAL = {
-    "base": {"x_ratio": 0.50, "y_margin": 30},
-    "visual_zero_deg": {"a1": 0, "a2": 0, "a3": 0},
-    "link_lengths_px": {"l1": 160, "l2": 120, "l3": 90},
-    "view_mode_default": "SIDE",
-    "ui": {"show_world_axes": True, "show_robot_axes": True, "show_ee_trace": True}
-}
-CAL_PATH = "calibration.json"
-
-
-
-
-# =========================
-# UI Button
-# =========================
-class Button:
-    def __init__(self, rect, text):
-        self.rect = pygame.Rect(rect)
-        self.text = text
-    def draw(self, screen, font, active=True):
-        color = (60, 60, 60) if active else (35, 35, 35)
-        pygame.draw.rect(screen, color, self.rect, border_radius=10)
-        pygame.draw.rect(screen, (120, 120, 120), self.rect, 2, border_radius=10)
-        txt = font.render(self.text, True, (240, 240, 240))
-        screen.blit(txt, txt.get_rect(center=self.rect.center))
-    def hit(self, pos):
-        return self.rect.collidepoint(pos)
-
-
-# =========================
-# Draw helpers (FK)
-# =========================
-def draw_panel_border(screen, x, y, w, h, title, font):
-    pygame.draw.rect(screen, (35, 35, 35), (x, y, w, h), border_radius=14)
-    pygame.draw.rect(screen, (120, 120, 120), (x, y, w, h), 2, border_radius=14)
-    screen.blit(font.render(title, True, (220, 220, 220)), (x + 12, y + 10))
-
-def draw_world_axes(screen, origin, axis_len=90, mono=None):
-    ox, oy = origin
-    pygame.draw.line(screen, (90, 90, 90), (ox, oy), (ox + axis_len, oy), 2)
-    pygame.draw.line(screen, (90, 90, 90), (ox, oy), (ox, oy - axis_len), 2)
-    pygame.draw.circle(screen, (90, 90, 90), (ox, oy), 3)
-    if mono:
-        screen.blit(mono.render("Xw", True, (120,120,120)), (ox + axis_len + 6, oy - 10))
-        screen.blit(mono.render("Yw", True, (120,120,120)), (ox - 20, oy - axis_len - 22))
-
-def draw_robot_axes(screen, origin, theta_rad, axis_len=80, mono=None):
-    ox, oy = origin
-    xr = (ox + axis_len*np.cos(theta_rad), oy - axis_len*np.sin(theta_rad))
-    yr = (ox + axis_len*np.cos(theta_rad + np.pi/2), oy - axis_len*np.sin(theta_rad + np.pi/2))
-    pygame.draw.line(screen, (0, 220, 255), (ox, oy), (int(xr[0]), int(xr[1])), 2)
-    pygame.draw.line(screen, (0, 220, 255), (ox, oy), (int(yr[0]), int(yr[1])), 2)
-    if mono:
-        screen.blit(mono.render("Xr", True, (0,220,255)), (int(xr[0]) + 6, int(xr[1]) - 10))
-        screen.blit(mono.render("Yr", True, (0,220,255)), (int(yr[0]) + 6, int(yr[1]) - 10))
-
-def fk_points_side(angles_deg, link_lengths_px, base_xy):
-    a1, a2, a3 = angles_deg
-    L1, L2, L3 = link_lengths_px
-    bx, by = base_xy
-
-    r1 = np.deg2rad(a1)
-    r2 = np.deg2rad(a2)
-    r3 = np.deg2rad(a3)
-
-    t1 = r1
-    t2 = r1 + r2
-    t3 = r1 + r2 + r3
-
-    p0 = (bx, by)
-    p1 = (bx + L1*np.cos(t1), by - L1*np.sin(t1))
-    p2 = (p1[0] + L2*np.cos(t2), p1[1] - L2*np.sin(t2))
-    p3 = (p2[0] + L3*np.cos(t3), p2[1] - L3*np.sin(t3))
-    return p0, p1, p2, p3, t1
-
-def draw_virtual_robot(screen, x, y, w, h, angles_actual, cal, view_mode, ee_trace, font, mono):
-    draw_panel_border(screen, x, y, w, h, f"Virtual Robot (ACTUAL) [{view_mode}]", font)
-
-    bx = int(x + w * float(cal["base"]["x_ratio"]))
-    by = int(y + h - int(cal["base"]["y_margin"]))
-    base = (bx, by)
-
-    vz = cal["visual_zero_deg"]
-    a1, a2, a3 = angles_actual
-    a1v = a1 + float(vz["a1"])
-    a2v = a2 + float(vz["a2"])
-    a3v = a3 + float(vz["a3"])
-
-    ll = cal["link_lengths_px"]
-    link_lengths = (int(ll["l1"]), int(ll["l2"]), int(ll["l3"]))
-
-    ui = cal.get("ui", {})
-    if ui.get("show_world_axes", True):
-        draw_world_axes(screen, base, axis_len=90, mono=mono)
-
-    p0, p1, p2, p3, theta = fk_points_side((a1v, a2v, a3v), link_lengths, base)
-
-    if ui.get("show_robot_axes", True):
-        draw_robot_axes(screen, base, theta, axis_len=80, mono=mono)
-
-    # EE trace
-    if ui.get("show_ee_trace", True) and len(ee_trace) >= 2:
-        pts = [(int(px), int(py)) for (px, py) in ee_trace]
-        clipped = [(px_, py_) for (px_, py_) in pts if x+6 <= px_ <= x+w-6 and y+6 <= py_ <= y+h-6]
-        if len(clipped) >= 2:
-            pygame.draw.lines(screen, (80,255,120), False, clipped, 2)
-
-    def ip(p): return (int(p[0]), int(p[1]))
-    pygame.draw.line(screen, (0,220,255), ip(p0), ip(p1), 6)
-    pygame.draw.line(screen, (0,220,255), ip(p1), ip(p2), 6)
-    pygame.draw.line(screen, (0,220,255), ip(p2), ip(p3), 6)
-
-    for pt in [p0, p1, p2, p3]:
-        pygame.draw.circle(screen, (240,240,240), ip(pt), 7)
-        pygame.draw.circle(screen, (20,20,20), ip(pt), 7, 2)
-    pygame.draw.circle(screen, (80,255,120), ip(p3), 10, 2)
-
-    screen.blit(mono.render(f"ACTUAL(raw)={tuple(angles_actual)}", True, (200,200,200)), (x+12, y+h-56))
-    screen.blit(mono.render(f"VISUAL(map)=({int(a1v)},{int(a2v)},{int(a3v)})", True, (160,160,160)), (x+12, y+h-32))
-    return (float(p3[0]), float(p3[1]))
-
 
 # =========================
 # MAIN
@@ -198,15 +43,23 @@ def main():
     ser = None
     serial_err = None
     if ENABLE_SERIAL_DRIVE:
-        if not HAS_SERIAL:
+        if PORT == "SIM":
+            ser = SimSerial(timeout=SERIAL_READ_TIMEOUT)
+        elif not HAS_SERIAL:
             serial_err = "pyserial not installed"
         else:
+            import serial
             try:
-                ser = serial.Serial(PORT, BAUD, timeout=0.0)
+                ser = serial.Serial(PORT, BAUD, timeout=SERIAL_READ_TIMEOUT)
                 time.sleep(1.0)
             except Exception as e:
                 serial_err = str(e)
                 ser = None
+    sio = None
+    if ser is not None:
+        proto = negotiate_protocol(ser, SERIAL_PROTOCOL)
+        sio = SerialEngine(ser, protocol=proto, seq_tags=negotiate_seq_tags(ser, proto)).start()
+    tx = TxScheduler(sio, rate_hz=TX_RATE_HZ, tol_deg=TX_TOL_DEG).start() if sio is not None else None
 
     cal = load_calibration(CAL_PATH)
     view_mode = cal.get("view_mode_default", "SIDE")
@@ -227,257 +80,219 @@ def main():
     btn_send  = Button((580, 740, 160, 55), "SEND: ON" if ENABLE_SERIAL_DRIVE else "SEND: OFF")
     btn_quit  = Button((760, 740, 160, 55), "QUIT")
 
+    hint = "Buttons: HOME/RESET/MODE/SEND/QUIT | Keys: V=Vision ON/OFF, M=Mode, K=IK map, C=Clear trace, Wheel=A3, S=Save calib, P=Timing, ESC=Quit"
+
+    def build_static(surf):
+        # everything that only changes with the calibration / window
+        surf.fill((22,22,22))
+        surf.blit(big.render("Industrial Digital Twin v6", True, (240,240,240)), (40, 20))
+        draw_robot_static(surf, 40, 190, 820, 500, cal, view_mode, font, mono)
+        draw_panel_border(surf, 900, 190, 340, 320, "Camera Monitoring (Motion/Marker)", font)
+        surf.blit(font.render(hint, True, (160,160,160)), (40, 805))
+
     # states
-    target = [90, 90, A3_DEFAULT]
-    actual = [90, 90, A3_DEFAULT]
-    fb_status = "NO_FB"
-    rx_buf = ""
-    last_fb_ts = 0.0
+    ctl = VisionController(cal, CAM_W, CAM_H, (A1_MIN, A1_MAX), (A2_MIN, A2_MAX),
+                           deadband_px=DEADBAND_PX, ema_alpha=EMA_ALPHA, rate_limit_deg=RATE_LIMIT_DEG,
+                           control_map=CONTROL_MAP, start=(90, 90, A3_DEFAULT))
 
     # camera
-    cam = CameraPanel(CAM_W, CAM_H, fps_limit=CAM_FPS_LIMIT, candidates=CAM_INDEX_CANDIDATES)
+    cam = CameraPanel(CAM_W, CAM_H, fps_limit=CAM_FPS_LIMIT, candidates=CAM_INDEX_CANDIDATES, enable=ENABLE_CAMERA,
+                      motion_thresh=MOTION_DIFF_THRESH, motion_min_area=MOTION_MIN_AREA,
+                      motion_downscale=MOTION_DOWNSCALE, marker_color=TRACK_COLOR,
+                      marker_min_area=MARKER_MIN_AREA, marker_roi_half=MARKER_ROI_HALF,
+                      use_process=VISION_PROCESS)
 
     # traces
-    ee_trace = []
-    cam_trace = []
-    motion_trace = []
-    last_ee = None
+    ee_trace = RingTrace(EE_TRACE_MAX, min_step=2)
+    cam_trace = RingTrace(TRACE_MAX)
+    last_cam_ts = None
+
+    ui = DirtyScreen(screen, build_static)
 
     # vision control
     vision_on = True         # Fault is open state（close =  V）
-    source = "VISION" if vision_on else "IDLE"
     mode = "MOTION"          # MOTION or MARKER
-    strategy = "B0_RAW"
 
-    # motion smooth state
-    sm_cx, sm_cy = None, None
-    last_center = None
-    last_sent = time.time()
+    # per-stage loop timing (overlay: P); the log gets the control loop's stages
+    timer = StageTimer(["snapshot", "camera", "draw", "flip", "events", "idle"], fps=FPS)
+    ctl_timer = StageTimer(CONTROL_STAGES, fps=CONTROL_HZ, window=CONTROL_HZ * 10)
+    show_timing = False
 
     # logger
-    logger = RunLogger()
-    print("[LOG] CSV path =", logger.path)
+    logger = RunLogger(LOG_FORMAT, async_write=LOG_ASYNC, overflow=LOG_OVERFLOW, flush_interval=LOG_FLUSH_S,
+                       extra_cols=ctl_timer.columns(), rotate_mb=LOG_ROTATE_MB, rotate_s=LOG_ROTATE_S,
+                       compress=LOG_COMPRESS, feedback=LOG_FEEDBACK, log_dir=LOG_DIR)
+    print("[LOG] path =", logger.path)
 
+    # control path on its own fixed-rate thread; the UI reads snapshots and posts commands
+    cl = ControlLoop(ctl, ctl_timer, sio=sio, tx=tx if ENABLE_SERIAL_DRIVE else None, logger=logger,
+                     rate_hz=CONTROL_HZ, source="VISION", mode=mode, vision_on=vision_on)
+    sys.setswitchinterval(GIL_SWITCH_S)
+    cl.start()
+    snap = cl.snapshot()
 
-    def read_feedback():
-        nonlocal rx_buf, actual, fb_status, last_fb_ts
-        if ser is None:
-            return
-        try:
-            data = ser.read(256)
-            if data:
-                rx_buf += data.decode("utf-8", errors="ignore")
-                while "\n" in rx_buf:
-                    line, rx_buf = rx_buf.split("\n", 1)
-                    fb = parse_feedback_line(line)
-                    if fb:
-                        a1, a2, a3, st = fb
-                        actual = [a1, a2, a3]
-                        fb_status = st
-                        last_fb_ts = time.time()
-        except Exception:
-            pass
 
     def link_text():
         if not ENABLE_SERIAL_DRIVE:
             return "LINK: SERIAL OFF", (160,160,160)
         if ser is None:
             return "LINK: SERIAL FAIL", (255,80,80)
-        if last_fb_ts == 0:
+        if snap["last_fb_ts"] == 0:
             return "LINK: WAITING...", (255,180,120)
-        if (time.time() - last_fb_ts) > 1.2:
+        if (time.monotonic() - snap["last_fb_ts"]) > FEEDBACK_LOST_S:
             return "LINK: FEEDBACK LOST", (255,80,80)
-        return "LINK: CONNECTED", (120,220,120)
-
-    def push_ee_trace(pt):
-        nonlocal last_ee
-        if pt is None:
-            return
-        if last_ee is None:
-            ee_trace.append(pt); last_ee = pt
-        else:
-            dx = pt[0] - last_ee[0]
-            dy = pt[1] - last_ee[1]
-            if dx*dx + dy*dy >= 4:
-                ee_trace.append(pt)
-                last_ee = pt
-        if len(ee_trace) > 900:
-            ee_trace.pop(0)
-
-    def compute_angles_from_center(cx, cy):
-        # cx in [0, CAM_W], cy in [0, CAM_H]
-        # map to A1 (left-right), A2 (up-down)
-        a1 = A1_MIN + (A1_MAX - A1_MIN) * (cx / max(1, CAM_W))
-        a2 = A2_MAX - (A2_MAX - A2_MIN) * (cy / max(1, CAM_H))  # up => larger
-        return clamp(a1, A1_MIN, A1_MAX), clamp(a2, A2_MIN, A2_MAX)
-
-    def smooth_and_limit(new_a1, new_a2):
-        # rate limit relative to current target
-        cur_a1, cur_a2 = target[0], target[1]
-        da1 = max(-RATE_LIMIT_DEG, min(RATE_LIMIT_DEG, new_a1 - cur_a1))
-        da2 = max(-RATE_LIMIT_DEG, min(RATE_LIMIT_DEG, new_a2 - cur_a2))
-        return clamp(cur_a1 + da1), clamp(cur_a2 + da2)
+        return f"LINK: CONNECTED [{sio.protocol}]", (120,220,120)
 
     running = True
     try:
         while running:
-            # read hardware feedback
-            read_feedback()
-
-            # camera update
-            cam.update()
-
-            # ----- Vision Control -----
-            dx = ""
-            dy = ""
+            timer.start()
+
+            # state published by the control thread after its last tick
+            snap = cl.snapshot()
+            target, actual, fb_status = snap["target"], snap["actual"], snap["fb_status"]
+            if cl.error is not None:
+                running = False
+            timer.mark("snapshot")
+
+            # camera update; the newest centroid goes to the control thread
+            cam.update(mode)
+            center = None
             if vision_on and ENABLE_CAMERA and HAS_CV2 and cam.ok:
-                center = None
-                if mode == "MOTION":
-                    center = cam.motion_center
-                else:
-                    center = cam.marker_center
-
-                if center is not None:
-                    cx, cy = center
-
-                    # deadband vs last_center
-                    if last_center is None:
-                        last_center = (cx, cy)
-                    if abs(cx - last_center[0]) < DEADBAND_PX and abs(cy - last_center[1]) < DEADBAND_PX:
-                        pass
-                    else:
-                        last_center = (cx, cy)
-
-                        # EMA smooth on pixel center
-                        if sm_cx is None:
-                            sm_cx, sm_cy = float(cx), float(cy)
-                        else:
-                            sm_cx = (1-EMA_ALPHA)*sm_cx + EMA_ALPHA*cx
-                            sm_cy = (1-EMA_ALPHA)*sm_cy + EMA_ALPHA*cy
-
-                        # to angles
-                        a1_new, a2_new = compute_angles_from_center(sm_cx, sm_cy)
-                        a1_new, a2_new = smooth_and_limit(a1_new, a2_new)
-                        target[0], target[1] = a1_new, a2_new
-
-                        dx = int(sm_cx)
-                        dy = int(sm_cy)
-
-                        # send to robot
-                        if ENABLE_SERIAL_DRIVE and ser is not None:
-                            send_T(ser, target[0], target[1], target[2])
-
-                    # trace for drawing (rot90)
-                    rx, ry = rot90_coord(int(cx), int(cy), CAM_W, CAM_H)
-                    cam_trace.append((rx, ry))
-                    if len(cam_trace) > TRACE_MAX:
-                        cam_trace.pop(0)
-
-            source = "VISION" if vision_on else "IDLE"
-
-            # ----- log -----
-            logger.log(strategy, source, mode, tuple(target), tuple(actual), dx, dy)
+                center = cam.motion_center if mode == "MOTION" else cam.marker_center
+                # trace for drawing (rot90), one point per camera frame
+                if center is not None and cam.frame_ts != last_cam_ts:
+                    last_cam_ts = cam.frame_ts
+                    rx, ry = rot90_coord(int(center[0]), int(center[1]), CAM_W, CAM_H)
+                    cam_trace.append(rx, ry)
+            cl.feed(center)
+            timer.mark("camera")
 
             # ----- draw -----
-            screen.fill((22,22,22))
-            screen.blit(big.render("Industrial Digital Twin v6", True, (240,240,240)), (40, 20))
-
+            # static content lives in ui.static; only items whose state changed are repainted
             lt, lc = link_text()
-            screen.blit(font.render(lt, True, lc), (40, 70))
-            screen.blit(font.render(f"FB_STATUS: {fb_status}", True, (200,200,200)), (260, 70))
+            ui.text("link", font, lt, lc, (40, 70))
+            ui.text("fb_status", font, f"FB_STATUS: {fb_status}", (200,200,200), (260, 70))
+            if tx is not None:
+                ui.text("tx", font, tx.stats_text(), (160,160,160), (600, 70))
+            if sio is not None:
+                ui.text("rtt", font, sio.rtt.text(), (160,160,160), (600, 35))
 
             if serial_err:
-                screen.blit(font.render(f"Serial error: {serial_err}", True, (255,120,120)), (40, 105))
+                ui.text("serial_err", font, f"Serial error: {serial_err}", (255,120,120), (40, 105))
 
-            screen.blit(font.render(f"BASELINE: {strategy}   SOURCE: {source}   VISION({mode}): {'ON' if vision_on else 'OFF'}", True, (180,180,180)), (40, 105))
-            screen.blit(font.render(f"CSV: {logger.path}", True, (160,160,160)), (40, 135))
+            reach = "" if snap["reachable"] else "   IK: OUT OF REACH (holding)"
+            ui.text("baseline", font, f"BASELINE: {snap['strategy']}   SOURCE: {snap['source']}   VISION({mode}): {'ON' if vision_on else 'OFF'}{reach}",
+                    (180,180,180) if snap["reachable"] else (255,180,120), (40, 105))
+            ui.text("log", font, f"LOG: {logger.path}  [{logger.stats_text()}]", (160,160,160), (40, 135))
 
             err = (target[0]-actual[0], target[1]-actual[1], target[2]-actual[2])
-            screen.blit(font.render(f"TARGET: {tuple(target)}", True, (180,180,180)), (40, 155))
-            screen.blit(font.render(f"ACTUAL: {tuple(actual)}", True, (0,220,255)), (320, 155))
-            screen.blit(font.render(f"ERROR : {err}", True, (255,180,120)), (600, 155))
+            ui.text("target", font, f"TARGET: {target}", (180,180,180), (40, 155))
+            ui.text("actual", font, f"ACTUAL: {actual}", (0,220,255), (320, 155))
+            ui.text("error", font, f"ERROR : {err}", (255,180,120), (600, 155))
 
             # left robot
-            ee = draw_virtual_robot(screen, 40, 190, 820, 500, tuple(actual), cal, view_mode, ee_trace, font, mono)
-            push_ee_trace(ee)
+            geom = robot_geometry(40, 190, 820, 500, actual, cal)
+            ee_trace.append(*geom["ee"])
+            if cal.get("ui", {}).get("show_ee_trace", True) and len(ee_trace):
+                # rect() only grows until clear(), so this dirty area widens over a long run
+                ui.item("ee_trace", ee_trace.version, ee_trace.rect().inflate(4, 4),
+                        lambda: draw_ee_trace(screen, 40, 190, 820, 500, ee_trace))
+            ui.item("robot", actual, geom["rect"], lambda: draw_robot_arm(screen, geom, cal, mono))
+            raw_txt, visual_txt = robot_labels(actual, geom)
+            ui.text("robot_raw", mono, raw_txt, (200,200,200), (52, 634))
+            ui.text("robot_visual", mono, visual_txt, (160,160,160), (52, 658))
 
             # right camera
-            draw_panel_border(screen, 900, 190, 340, 320, "Camera Monitoring (Motion/Marker)", font)
             cam_x = 900 + (340 - CAM_W)//2
             cam_y = 190 + 45
 
             if ENABLE_CAMERA and HAS_CV2 and cam.ok and cam.last_frame is not None:
-                screen.blit(cam.last_frame, (cam_x, cam_y))
-                pygame.draw.rect(screen, (120,120,120), (cam_x, cam_y, CAM_W, CAM_H), 1)
+                # frame + trace change together (frame_ts advances with every presented frame)
+                col = (255,160,80) if mode == "MOTION" else (80,255,120)
+                cam_state = (cam.frame_ts, cam_trace.version, col)
 
-                # trace
-                if len(cam_trace) >= 2:
-                    pts = [(cam_x + x, cam_y + y) for (x, y) in cam_trace]
-                    col = (255,160,80) if mode == "MOTION" else (80,255,120)
-                    pygame.draw.lines(screen, col, False, pts, 2)
+                def draw_cam():
+                    screen.blit(cam.last_frame, (cam_x, cam_y))
+                    pygame.draw.rect(screen, (120,120,120), (cam_x, cam_y, CAM_W, CAM_H), 1)
+                    draw_trace(screen, cam_trace.screen_points(offset=(cam_x, cam_y)), col, 2)
+                ui.item("cam", cam_state, (cam_x, cam_y, CAM_W, CAM_H), draw_cam)
 
                 # status text
-                screen.blit(mono.render("Orange=motion   Green=marker", True, (180,180,180)), (910, 470))
-                screen.blit(mono.render("Keys: V on/off, M motion/marker, C clear", True, (160,160,160)), (910, 495))
+                ui.text("cam_stats", mono, cam.stats_text(), (160,160,160), (910, 445))
+                if mode == "MARKER":
+                    ui.text("marker_stats", mono, cam.marker.stats_text(), (80,255,120), (910, 420))
+                ui.text("cam_legend", mono, "Orange=motion   Green=marker", (180,180,180), (910, 470))
+                ui.text("cam_keys", mono, "Keys: V on/off, M motion/marker, C clear", (160,160,160), (910, 495))
             else:
                 msg = "CAM OFF (pip install opencv-python)" if not HAS_CV2 else "CAM NOT FOUND"
-                screen.blit(mono.render(msg, True, (255,80,80)), (910, 330))
-                screen.blit(mono.render("Tip: plug webcam, try index 0/1/2", True, (160,160,160)), (910, 355))
+                ui.text("cam_msg", mono, msg, (255,80,80), (910, 330))
+                ui.text("cam_tip", mono, "Tip: plug webcam, try index 0/1/2", (160,160,160), (910, 355))
 
             # buttons row
             btn_mode.text = f"MODE: {mode}"
             btn_send.text = "SEND: ON" if ENABLE_SERIAL_DRIVE else "SEND: OFF"
             for b in [btn_home, btn_reset, btn_mode, btn_send, btn_quit]:
-                b.draw(screen, font, active=True)
+                ui.item(("btn", b.rect.topleft), b.text, b.rect, lambda b=b: b.draw(screen, font, active=True))
 
-            # footer hints
-            hint = "Buttons: HOME/RESET/MODE/SEND/QUIT | Keys: V=Vision ON/OFF, M=Mode, C=Clear trace, Wheel=A3, S=Save calib, ESC=Quit"
-            screen.blit(font.render(hint, True, (160,160,160)), (40, 805))
+            if show_timing:
+                rows = ["UI"] + timer.lines() + [ui.stats_text(), "", cl.stats_text()] + ctl_timer.lines()
+                for i, row in enumerate(rows):
+                    ui.text(("timing", i), mono, row, (255,220,120), (520, 230 + 22 * i))
+            timer.mark("draw")
 
-            pygame.display.flip()
+            ui.present()
+            timer.mark("flip")
 
             # ----- events -----
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
 
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    ui.invalidate()
+
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         running = False
 
                     elif event.key == pygame.K_v:
                         vision_on = not vision_on
+                        cl.set_vision(vision_on)
 
                     elif event.key == pygame.K_m:
                         mode = "MARKER" if mode == "MOTION" else "MOTION"
+                        cl.set_mode(mode)
 
                     elif event.key == pygame.K_c:
-                        cam_trace = []
+                        cam_trace.clear()
+
+                    elif event.key == pygame.K_p:
+                        show_timing = not show_timing
+
+                    elif event.key == pygame.K_k:
+                        cl.toggle_map()
 
                     elif event.key == pygame.K_s:
                         ok = save_calibration(cal, CAL_PATH)
-                        fb_status = "CAL_SAVED" if ok else "CAL_SAVE_FAIL"
+                        cl.set_status("CAL_SAVED" if ok else "CAL_SAVE_FAIL")
 
                 if event.type == pygame.MOUSEWHEEL:
-                    target[2] = clamp(target[2] + event.y * MANUAL_STEP_A3_PER_WHEEL)
-                    if ENABLE_SERIAL_DRIVE and ser is not None:
-                        send_T(ser, target[0], target[1], target[2])
+                    cl.nudge_a3(event.y * MANUAL_STEP_A3_PER_WHEEL)
 
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     pos = event.pos
                     if btn_home.hit(pos):
-                        target = [90, 90, target[2]]
-                        if ENABLE_SERIAL_DRIVE and ser is not None:
-                            send_T(ser, target[0], target[1], target[2])
-                        fb_status = "HOME_SENT"
+                        cl.home()
 
                     elif btn_reset.hit(pos):
-                        cam_trace = []
-                        ee_trace = []
-                        fb_status = "TRACE_RESET"
+                        cam_trace.clear()
+                        ee_trace.clear()
+                        cl.set_status("TRACE_RESET")
 
                     elif btn_mode.hit(pos):
                         mode = "MARKER" if mode == "MOTION" else "MOTION"
+                        cl.set_mode(mode)
 
                     elif btn_send.hit(pos):
                         
@@ -486,7 +301,11 @@ def main():
                     elif btn_quit.hit(pos):
                         running = False
 
+            timer.mark("events")
+
             clock.tick(FPS)
+            timer.mark("idle")
+            timer.end()
 
     except Exception as e:
         
@@ -495,6 +314,10 @@ def main():
         traceback.print_exc()
 
     # cleanup
+    try:
+        cl.stop()
+    except Exception:
+        pass
     try:
         cam.close()
     except Exception:
@@ -503,6 +326,16 @@ def main():
         logger.close()
     except Exception:
         pass
+    try:
+        if tx is not None:
+            tx.stop()
+    except Exception:
+        pass
+    try:
+        if sio is not None:
+            sio.stop()
+    except Exception:
+        pass
     try:
         if ser is not None:
             ser.close()
@@ -0,0 +1,274 @@
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+
+# =========================
+# Text render cache
+# =========================
+class TextCache:
+    """
+    LRU memo of font.render() results keyed by (font, text, colour, antialias).
+
+    Labels that do not change between frames are rendered once; values that
+    do change (counters, angles) simply miss and push the oldest entries out,
+    so memory stays bounded by maxsize surfaces.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = max(1, int(maxsize))
+        self._d = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self._d.get(key)
+        if surf is not None:
+            self._d.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._d[key] = surf
+        if len(self._d) > self.maxsize:
+            self._d.popitem(last=False)
+        return surf
+
+    def stats_text(self):
+        n = self.hits + self.misses
+        return f"text cache {len(self._d)}/{self.maxsize}  hit {100.0 * self.hits / n if n else 0.0:.0f}%"
+
+
+def merge_rects(rects):
+    """Union overlapping rects so every pixel is repainted at most once."""
+    out = []
+    for r in rects:
+        r = pygame.Rect(r)
+        merged = True
+        while merged:
+            merged = False
+            for i, o in enumerate(out):
+                if o.colliderect(r):
+                    r.union_ip(o)
+                    out.pop(i)
+                    merged = True
+                    break
+        out.append(r)
+    return out
+
+
+# =========================
+# Point traces
+# =========================
+class RingTrace:
+    """
+    Fixed-capacity point history with O(1) append.
+
+    Points are written twice, at slot i and i + capacity, so the newest n
+    points are always one contiguous (n, 2) slice of the buffer - no
+    reordering or copying to read them. Appends closer than min_step px to
+    the previous point are skipped. version changes on every append and
+    clear (DirtyScreen state); rect() bounds all points since the last clear.
+    """
+
+    def __init__(self, capacity, min_step=0.0):
+        self.capacity = max(2, int(capacity))
+        self.min_step2 = float(min_step) ** 2
+        self._buf = np.zeros((2 * self.capacity, 2))
+        self.version = 0
+        self._cache = None
+        self.clear()
+
+    def clear(self):
+        self._head = 0
+        self._n = 0
+        self.last = None
+        self._box = None
+        self.version += 1
+
+    def __len__(self):
+        return self._n
+
+    def append(self, x, y):
+        """Add a point; False if it was within min_step of the last one."""
+        last = self.last
+        if last is not None and self.min_step2:
+            dx = x - last[0]
+            dy = y - last[1]
+            if dx * dx + dy * dy < self.min_step2:
+                return False
+        x, y = float(x), float(y)
+        h = self._head
+        buf = self._buf
+        buf[h, 0] = buf[h + self.capacity, 0] = x
+        buf[h, 1] = buf[h + self.capacity, 1] = y
+        self._head = h + 1 if h + 1 < self.capacity else 0
+        if self._n < self.capacity:
+            self._n += 1
+        self.last = (x, y)
+        b = self._box
+        if b is None:
+            self._box = [x, y, x, y]
+        else:
+            if x < b[0]: b[0] = x
+            elif x > b[2]: b[2] = x
+            if y < b[1]: b[1] = y
+            elif y > b[3]: b[3] = y
+        self.version += 1
+        return True
+
+    def points(self):
+        """(n, 2) float64 view of the points, oldest first (do not modify)."""
+        start = self._head - self._n
+        if start < 0:
+            start += self.capacity
+        return self._buf[start:start + self._n]
+
+    def __array__(self, dtype=None, copy=None):
+        pts = self.points()
+        return pts if dtype is None else pts.astype(dtype)
+
+    def rect(self):
+        """
+        pygame.Rect around every point since the last clear, None when empty.
+
+        The box only grows: points trimmed off the ring still count until
+        clear(), so a long-running trace used as a dirty rect slowly spreads
+        over the whole panel (repaints get larger, never wrong).
+        """
+        b = self._box
+        if b is None:
+            return None
+        x0, y0 = int(b[0]), int(b[1])
+        return pygame.Rect(x0, y0, int(b[2]) - x0 + 1, int(b[3]) - y0 + 1)
+
+    def screen_points(self, bounds=None, offset=(0, 0)):
+        """
+        Contiguous (k, 2) int32 screen points for pygame.draw.lines.
+
+        Shifts by offset, truncates like int() and drops points outside
+        bounds (x0, y0, x1, y1, inclusive) in one pass. The result is cached
+        until the trace changes.
+        """
+        key = (self.version, bounds, offset)
+        if self._cache is not None and self._cache[0] == key:
+            return self._cache[1]
+        pts = clip_points(self.points(), bounds, offset)
+        self._cache = (key, pts)
+        return pts
+
+
+def clip_points(pts, bounds=None, offset=(0, 0)):
+    """Vectorised int conversion + bounds filter; see RingTrace.screen_points."""
+    p = np.asarray(pts, dtype=np.float64)
+    if offset != (0, 0):
+        p = p + offset
+    ip = p.astype(np.int32)
+    if bounds is not None and len(ip):
+        x0, y0, x1, y1 = bounds
+        x, y = ip[:, 0], ip[:, 1]
+        ip = ip[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+    return np.ascontiguousarray(ip)
+
+
+def draw_trace(screen, pts, color, width=2):
+    """Polyline through screen points (from clip_points / screen_points)."""
+    if len(pts) >= 2:
+        pygame.draw.lines(screen, color, False, pts, width)
+
+
+# =========================
+# Dirty-rectangle screen
+# =========================
+class DirtyScreen:
+    """
+    Frame composition that repaints and presents only what changed.
+
+    Static content (background, titles, panel frames, hints) is drawn once by
+    build_static(surface) into an offscreen copy of the screen. Every frame
+    the caller declares the dynamic items - key, state, bounding rect and a
+    draw callable - and present():
+      - finds rects of items that appeared, disappeared, moved or changed state,
+      - restores the static background there and redraws every item that
+        overlaps (clipped, in declaration order),
+      - hands only those rects to pygame.display.update().
+    Unchanged items cost a tuple comparison. invalidate() forces one full
+    repaint (window exposed, static content rebuilt).
+    """
+
+    def __init__(self, screen, build_static, text_cache=None):
+        self.screen = screen
+        self.build_static = build_static
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.static = pygame.Surface(screen.get_size()).convert(screen)
+        self.bounds = screen.get_rect()
+        self._prev = {}
+        self._cur = {}
+        self.full = True
+        self.frames = 0
+        self.dirty_px = 0
+        self.rebuild_static()
+
+    def rebuild_static(self):
+        self.build_static(self.static)
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def item(self, key, state, rect, draw):
+        """Declare a dynamic item for this frame; draw() paints it onto self.screen."""
+        self._cur[key] = (state, pygame.Rect(rect).clip(self.bounds), draw)
+
+    def text(self, key, font, text, color, pos):
+        """Declare a text item, rendered through the text cache."""
+        surf = self.text_cache.render(font, text, color)
+        rect = surf.get_rect(topleft=pos)
+        screen = self.screen
+        self._cur[key] = ((font, text, color), rect.clip(self.bounds), lambda: screen.blit(surf, rect))
+
+    def _dirty(self):
+        if self.full:
+            return [self.bounds.copy()]
+        cur, prev = self._cur, self._prev
+        dirty = []
+        for key, (state, rect, _) in cur.items():
+            old = prev.get(key)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] != state or old[1] != rect:
+                dirty.append(old[1])
+                dirty.append(rect)
+        for key, (_, rect, _) in prev.items():
+            if key not in cur:
+                dirty.append(rect)
+        return merge_rects(r for r in dirty if r.w > 0 and r.h > 0)
+
+    def present(self):
+        """Repaint the dirty rects, push them to the display and start the next frame."""
+        dirty = self._dirty()
+        screen = self.screen
+        items = list(self._cur.values())
+        for r in dirty:
+            screen.set_clip(r)
+            screen.blit(self.static, r, r)
+            for _, rect, draw in items:
+                if rect.colliderect(r):
+                    draw()
+        screen.set_clip(None)
+
+        if self.full:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+        self.full = False
+        self.frames += 1
+        self.dirty_px = sum(r.w * r.h for r in dirty)
+        self._prev, self._cur = self._cur, {}
+        return dirty
+
+    def stats_text(self):
+        total = self.bounds.w * self.bounds.h
+        return f"dirty {100.0 * self.dirty_px / total:.0f}%  {self.text_cache.stats_text()}"
@@ -0,0 +1,467 @@
+import gzip
+import json
+import lzma
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+# =========================
+# Binary run-log format
+# =========================
+# File layout:
+#   magic   8 bytes  b"RALOG1\0\0"
+#   hlen    u32 LE   length of the JSON header that follows
+#   header  JSON     {"dtype": [...], "t0_wall_ns": ..., "t0_mono_ns": ..., "columns": [...]}
+#   padding          zeros up to DATA_ALIGN
+#   records          fixed-width LOG_DTYPE rows, appended until the file is closed
+# A partially written trailing record (crash, live tail) is ignored on read.
+MAGIC = b"RALOG1\0\0"
+DATA_ALIGN = 64
+BIN_EXT = ".rlog"
+
+LOG_DTYPE = np.dtype([
+    ("t_ns", "<i8"),                 # time.monotonic_ns()
+    ("strategy", "S8"), ("source", "S8"), ("mode", "S8"),
+    ("target_a1", "<f4"), ("target_a2", "<f4"), ("target_a3", "<f4"),
+    ("actual_a1", "<f4"), ("actual_a2", "<f4"), ("actual_a3", "<f4"),
+    ("err_a1", "<f4"), ("err_a2", "<f4"), ("err_a3", "<f4"),
+    ("dx", "<f4"), ("dy", "<f4"),    # NaN when no vision update
+    ("rtt_ms", "<f4"), ("rtt_p95_ms", "<f4"),
+])
+
+# Full-rate controller feedback (every decoded F line / frame, not one per
+# control tick), written next to the run log as fb_<ts>.rlog in the same
+# file layout.
+FB_LOG_DTYPE = np.dtype([
+    ("t_ns", "<i8"),                 # receive time, time.monotonic_ns()
+    ("a1", "<f4"), ("a2", "<f4"), ("a3", "<f4"),
+    ("status", "S8"), ("seq", "<i4"),
+])
+
+_HLEN = struct.Struct("<I")
+
+
+def _num(v):
+    """Numeric log field; '' / None (not available) become NaN."""
+    if v is None or v == "":
+        return np.nan
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def write_header(f, dtype=LOG_DTYPE, extra=None):
+    """Write magic + JSON header + padding; return the data offset."""
+    hdr = {
+        "dtype": [(name, dtype.fields[name][0].str) for name in dtype.names],
+        "t0_wall_ns": time.time_ns(),
+        "t0_mono_ns": time.monotonic_ns(),
+        "columns": list(dtype.names),
+    }
+    if extra:
+        hdr.update(extra)
+    body = json.dumps(hdr).encode("utf-8")
+    head = MAGIC + _HLEN.pack(len(body)) + body
+    pad = (-len(head)) % DATA_ALIGN
+    f.write(head + b"\0" * pad)
+    return len(head) + pad
+
+
+def read_header(path):
+    """Return (header dict, numpy dtype, data offset) of a binary run log."""
+    with open_maybe_compressed(path) as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"not a binary run log: {path}")
+        (hlen,) = _HLEN.unpack(f.read(_HLEN.size))
+        hdr = json.loads(f.read(hlen).decode("utf-8"))
+    head = len(MAGIC) + _HLEN.size + hlen
+    offset = head + (-head) % DATA_ALIGN
+    dtype = np.dtype([tuple(d) for d in hdr["dtype"]])
+    return hdr, dtype, offset
+
+
+def open_bin_log(path):
+    """
+    Memory-map a binary run log.
+
+    Returns:
+      (header, records) where records is a read-only np.memmap of the complete
+      rows; nothing is parsed or copied until fields are accessed.
+      Compressed segments (.rlog.gz / .rlog.xz) are read into memory instead.
+    """
+    hdr, dtype, offset = read_header(path)
+    if strip_compress_ext(path) != path:
+        # compressed segment: decompress into memory, no mmap possible
+        with open_maybe_compressed(path) as f:
+            data = f.read()[offset:]
+        n = len(data) // dtype.itemsize
+        return hdr, np.frombuffer(data, dtype=dtype, count=n)
+    n = max(0, (os.path.getsize(path) - offset) // dtype.itemsize)
+    if n == 0:
+        return hdr, np.empty(0, dtype)
+    return hdr, np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n,))
+
+
+def to_frame(hdr, rec):
+    """
+    Wrap records as a pandas DataFrame with the CSV column names.
+
+    't' is wall-clock seconds (float) derived from the monotonic t_ns and the
+    header's t0 pair; string columns are decoded to str.
+    """
+    import pandas as pd
+
+    cols = {}
+    for name in rec.dtype.names:
+        col = rec[name]
+        if col.dtype.kind == "S":
+            col = col.astype("U")
+        cols[name] = col
+    t_ns = rec["t_ns"].astype(np.int64)
+    cols["t"] = (hdr["t0_wall_ns"] + (t_ns - hdr["t0_mono_ns"])) / 1e9
+    return pd.DataFrame(cols)
+
+
+class BinLogWriter:
+    """
+    Append LOG_DTYPE records to a binary run log.
+
+    Rows are staged in a preallocated block and written with one write() per
+    block_rows rows (and on flush/close). extra_cols appends float32 columns
+    (e.g. loop stage timings) after the standard ones; the header records
+    them like any other field.
+    """
+
+    def __init__(self, path, block_rows=256, extra_cols=()):
+        self.path = path
+        self.extra_cols = list(extra_cols)
+        self.dtype = np.dtype(LOG_DTYPE.descr + [(c, "<f4") for c in self.extra_cols])
+        self.f = open(path, "wb")
+        self.offset = write_header(self.f, self.dtype)
+        self.block = np.zeros(max(1, int(block_rows)), self.dtype)
+        self.k = 0
+        self.rows = 0
+
+    def append(self, strategy, source, mode, target, actual, dx, dy, rtt_ms="", rtt_p95_ms="", t_ns=None, extra=()):
+        r = self.block[self.k]
+        r["t_ns"] = time.monotonic_ns() if t_ns is None else t_ns
+        r["strategy"] = str(strategy).encode("ascii", "replace")[:8]
+        r["source"] = str(source).encode("ascii", "replace")[:8]
+        r["mode"] = str(mode).encode("ascii", "replace")[:8]
+        r["target_a1"], r["target_a2"], r["target_a3"] = target[0], target[1], target[2]
+        r["actual_a1"], r["actual_a2"], r["actual_a3"] = actual[0], actual[1], actual[2]
+        r["err_a1"] = target[0] - actual[0]
+        r["err_a2"] = target[1] - actual[1]
+        r["err_a3"] = target[2] - actual[2]
+        r["dx"], r["dy"] = _num(dx), _num(dy)
+        r["rtt_ms"], r["rtt_p95_ms"] = _num(rtt_ms), _num(rtt_p95_ms)
+        for c, v in zip(self.extra_cols, extra):
+            r[c] = _num(v)
+        self.k += 1
+        self.rows += 1
+        if self.k == len(self.block):
+            self.flush()
+
+    def flush(self):
+        if self.k:
+            self.f.write(self.block[:self.k].tobytes())
+            self.k = 0
+        self.f.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.f.close()
+
+
+class FeedbackLogWriter:
+    """
+    Append decoded feedback batches (SerialEngine.drain_history) as
+    FB_LOG_DTYPE records; one write() per batch. Readable with open_bin_log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "wb")
+        self.offset = write_header(self.f, FB_LOG_DTYPE)
+        self.rows = 0
+
+    def append(self, t, records):
+        """t: receive times (monotonic seconds), records: FB_DTYPE array of the same length."""
+        out = np.empty(len(records), FB_LOG_DTYPE)
+        out["t_ns"] = np.asarray(t) * 1e9
+        for name in ("a1", "a2", "a3", "seq"):
+            out[name] = records[name]
+        out["status"] = np.char.encode(records["status"], "ascii", "replace")
+        self.f.write(out.tobytes())
+        self.rows += len(out)
+
+    def write_batches(self, batches):
+        for t, records in batches:
+            self.append(t, records)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+# =========================
+# Segment compression + run index
+# =========================
+# index.jsonl holds one JSON object per line. A segment gets an "open" line
+# when it is created and a "closed" line once it is final (and compressed, if
+# enabled); readers fold the lines by segment name, so the file is only ever
+# appended to. Times are wall-clock seconds.
+INDEX_NAME = "index.jsonl"
+COMPRESS_EXT = {"gzip": ".gz", "lzma": ".xz"}
+
+_index_lock = threading.Lock()
+
+
+def strip_compress_ext(path):
+    """path without a trailing .gz / .xz."""
+    for ext in COMPRESS_EXT.values():
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def open_maybe_compressed(path):
+    """Open a (possibly gzip/lzma compressed) log for binary reading."""
+    if path.endswith(COMPRESS_EXT["gzip"]):
+        return gzip.open(path, "rb")
+    if path.endswith(COMPRESS_EXT["lzma"]):
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+
+def compress_file(path, method="gzip", chunk=1 << 20):
+    """Stream path into path.gz / path.xz, then remove the original. Returns the new path."""
+    if method not in COMPRESS_EXT:
+        raise ValueError(f"unknown compression: {method!r}")
+    dst = path + COMPRESS_EXT[method]
+    tmp = dst + ".part"
+    opener = gzip.open if method == "gzip" else lzma.open
+    with open(path, "rb") as src, opener(tmp, "wb") as out:
+        shutil.copyfileobj(src, out, chunk)
+    os.replace(tmp, dst)
+    os.remove(path)
+    return dst
+
+
+def append_index(log_dir, entry):
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+    with _index_lock:
+        with open(os.path.join(log_dir, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def read_index(log_dir):
+    """
+    Return the segments recorded in log_dir/index.jsonl, oldest first.
+
+    Each entry has segment, run, path (relative to log_dir), state
+    ("open"/"closed"), t_start, t_end, rows, strategies and modes.
+    Missing or unreadable index -> [].
+    """
+    segs = {}
+    try:
+        with open(os.path.join(log_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue        # torn last line
+                segs.setdefault(e.get("segment"), {}).update(e)
+    except OSError:
+        return []
+    return sorted(segs.values(), key=lambda e: e.get("t_start") or 0.0)
+
+
+def latest_segment(log_dir):
+    """Path of the most recently started segment that still exists and is not empty, or None."""
+    for e in reversed(read_index(log_dir)):
+        if e.get("state") == "closed" and not e.get("rows"):
+            continue        # closed without a single row
+        p = os.path.join(log_dir, e.get("path", ""))
+        if os.path.isfile(p):
+            return p
+    return None
+
+
+def segments_between(log_dir, t0=None, t1=None):
+    """Existing segment paths whose time range overlaps [t0, t1] (wall seconds)."""
+    out = []
+    for e in read_index(log_dir):
+        start = e.get("t_start")
+        end = e.get("t_end") if e.get("t_end") is not None else time.time()
+        if start is None or (t1 is not None and start > t1) or (t0 is not None and end < t0):
+            continue
+        p = os.path.join(log_dir, e.get("path", ""))
+        if os.path.isfile(p):
+            out.append(p)
+    return out
+
+
+class SegmentCompressor:
+    """
+    Background thread that compresses closed segments and records them in the index.
+
+    With method=None segments are only indexed. close() waits for the queue
+    to drain so no half-written .part file is left behind.
+    """
+
+    def __init__(self, log_dir, method=None):
+        if method is not None and method not in COMPRESS_EXT:
+            raise ValueError(f"unknown compression: {method!r}")
+        self.log_dir = log_dir
+        self.method = method
+        self.q = queue.Queue()
+        self.done = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._loop, name="log-compress", daemon=True)
+        self._thread.start()
+
+    def submit(self, path, entry):
+        self.q.put((path, entry))
+
+    def pending(self):
+        return self.q.qsize()
+
+    def _loop(self):
+        while True:
+            item = self.q.get()
+            if item is None:
+                return
+            path, entry = item
+            if self.method is not None:
+                try:
+                    path = compress_file(path, self.method)
+                except Exception:
+                    self.errors += 1
+            entry["path"] = os.path.relpath(path, self.log_dir)
+            try:
+                entry["bytes"] = os.path.getsize(path)
+                append_index(self.log_dir, entry)
+            except Exception:
+                self.errors += 1
+            self.done += 1
+
+    def close(self, timeout=60.0):
+        self.q.put(None)
+        self._thread.join(timeout)
+
+
+# =========================
+# Asynchronous batched writer
+# =========================
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class AsyncLogWriter:
+    """
+    Bounded queue drained in batches by a background writer thread.
+
+    `put()` only appends a record tuple; formatting and disk I/O happen in
+    write_rows(batch) on the writer thread, and flush() is called at most
+    every flush_interval seconds. When the queue holds maxsize records the
+    overflow policy decides:
+      block       - the caller waits for space (never loses data)
+      drop_oldest - the oldest queued record is discarded
+      drop_newest - the new record is discarded
+    Discards are counted in dropped_oldest / dropped_newest.
+    """
+
+    def __init__(self, write_rows, flush, maxsize=4096, policy="drop_oldest",
+                 flush_interval=0.5, batch_max=512):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {policy!r}")
+        self.write_rows = write_rows
+        self.flush_fn = flush
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.batch_max = max(1, int(batch_max))
+
+        self.q = deque()
+        self.cv = threading.Condition()
+        self.written = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.errors = 0
+        self.high_water = 0
+
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, rec) -> bool:
+        with self.cv:
+            if len(self.q) >= self.maxsize:
+                if self.policy == "block":
+                    while len(self.q) >= self.maxsize and not self._stop:
+                        self.cv.wait(0.1)
+                elif self.policy == "drop_newest":
+                    self.dropped_newest += 1
+                    return False
+                else:
+                    self.q.popleft()
+                    self.dropped_oldest += 1
+            self.q.append(rec)
+            n = len(self.q)
+            if n > self.high_water:
+                self.high_water = n
+            if n >= self.batch_max:
+                self.cv.notify_all()
+        return True
+
+    def stats_text(self):
+        return f"q={len(self.q)} written={self.written} dropped={self.dropped_oldest + self.dropped_newest}"
+
+    def _take(self):
+        n = min(len(self.q), self.batch_max)
+        return [self.q.popleft() for _ in range(n)]
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while True:
+            with self.cv:
+                if not self._stop and len(self.q) < self.batch_max:
+                    self.cv.wait(self.flush_interval)
+                batch = self._take()
+                stopping = self._stop and not self.q
+                self.cv.notify_all()    # wake producers blocked on a full queue
+            if batch:
+                try:
+                    self.write_rows(batch)
+                    self.written += len(batch)
+                except Exception:
+                    self.errors += 1
+            now = time.monotonic()
+            if stopping or now - last_flush >= self.flush_interval:
+                try:
+                    self.flush_fn()
+                except Exception:
+                    self.errors += 1
+                last_flush = now
+            if stopping:
+                return
+
+    def close(self, timeout=5.0):
+        """Stop the writer thread after it has drained and flushed everything queued."""
+        with self.cv:
+            self._stop = True
+            self.cv.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,285 @@
+import argparse
+import heapq
+import os
+import random
+import threading
+import time
+
+from .Serial_IO import (
+    FB_STATUS_BYTES, PROTO_ASCII, PROTO_BIN, pack_F_frame, unpack_T_frames,
+)
+from .utils import clamp
+
+
+# =========================
+# Servo / link model
+# =========================
+class SimController:
+    """
+    Software stand-in for the Arduino controller.
+
+    Speaks the same protocol as the firmware: 'T,a1,a2,a3[,seq]' commands in,
+    'F,a1,a2,a3,status[,seq]' feedback out, plus the 'P,BIN' / 'P,SEQ' handshakes and
+    binary frames. Feedback echoes the sequence number of the last applied
+    command. Each joint follows its target through a first-order lag (tau_s)
+    with a slew limit (rate_deg_s). Both directions of the link add
+    latency_s + uniform jitter in [0, jitter_s] and lose packets with
+    probability loss.
+
+    The model is time-driven: call `receive()` with host bytes and `tick()`
+    with the current monotonic time; `tick()` returns the bytes due for
+    delivery to the host.
+    """
+
+    def __init__(self, rate_deg_s=180.0, tau_s=0.08, latency_s=0.005, jitter_s=0.002, loss=0.0,
+                 fb_hz=100.0, start=(90.0, 90.0, 90.0), seed=None):
+        self.rate_deg_s = max(1e-6, float(rate_deg_s))
+        self.tau_s = max(0.0, float(tau_s))
+        self.latency_s = max(0.0, float(latency_s))
+        self.jitter_s = max(0.0, float(jitter_s))
+        self.loss = min(1.0, max(0.0, float(loss)))
+        self.fb_period = 1.0 / max(1.0, float(fb_hz))
+        self.rng = random.Random(seed)
+
+        self.pos = [float(a) for a in start]
+        self.target = list(self.pos)
+        self.protocol = PROTO_ASCII
+        self.seq = None      # last applied command sequence number
+
+        self.rx_buf = bytearray()
+        self._inbox = []     # heap of (apply_t, n, (target, seq))
+        self._outbox = []    # heap of (deliver_t, n, bytes)
+        self._n = 0
+        self.last_t = None
+        self.next_fb_t = None
+
+        self.cmds_rx = 0
+        self.cmds_lost = 0
+        self.fb_tx = 0
+        self.fb_lost = 0
+
+    def _delay(self):
+        return self.latency_s + (self.rng.random() * self.jitter_s if self.jitter_s else 0.0)
+
+    def _push(self, heap, t, item):
+        self._n += 1
+        heapq.heappush(heap, (t, self._n, item))
+
+    def receive(self, data: bytes, now: float):
+        """Accept bytes written by the host at time now."""
+        buf = self.rx_buf
+        buf += data
+        if self.protocol == PROTO_BIN:
+            frames, consumed, _ = unpack_T_frames(buf)
+            del buf[:consumed]
+            for a1, a2, a3, seq in frames:
+                self._command((a1, a2, a3), seq, now)
+            return
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                break
+            line = buf[:nl].decode("utf-8", errors="ignore").strip()
+            del buf[:nl + 1]
+            if line == "P,BIN":
+                # handshake is not subject to loss; switch after the reply is on the wire
+                self._push(self._outbox, now + self._delay(), b"P,BIN,OK\n")
+                self.protocol = PROTO_BIN
+                return self.receive(b"", now)
+            if line == "P,SEQ":
+                self._push(self._outbox, now + self._delay(), b"P,SEQ,OK\n")
+                continue
+            if line.startswith("T"):
+                parts = line.split(",")
+                if len(parts) >= 4:
+                    try:
+                        cmd = (float(parts[1]), float(parts[2]), float(parts[3]))
+                        seq = int(parts[4]) if len(parts) >= 5 else None
+                    except ValueError:
+                        continue
+                    self._command(cmd, seq, now)
+
+    def _command(self, cmd, seq, now):
+        self.cmds_rx += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.cmds_lost += 1
+            return
+        self._push(self._inbox, now + self._delay(), (cmd, seq))
+
+    def _integrate(self, t):
+        if self.last_t is None:
+            self.last_t = t
+            return
+        dt = t - self.last_t
+        if dt <= 0:
+            return
+        self.last_t = t
+        max_step = self.rate_deg_s * dt
+        for j in range(3):
+            err = self.target[j] - self.pos[j]
+            step = err if self.tau_s <= 0 else err * min(1.0, dt / self.tau_s)
+            self.pos[j] += max(-max_step, min(max_step, step))
+
+    def moving(self):
+        return any(abs(t - p) > 0.5 for t, p in zip(self.target, self.pos))
+
+    def feedback_bytes(self) -> bytes:
+        a1, a2, a3 = self.pos
+        st = "MOVING" if self.moving() else "IDLE"
+        if self.protocol == PROTO_BIN:
+            return pack_F_frame(self.seq or 0, a1, a2, a3, FB_STATUS_BYTES[st])
+        if self.seq is None:
+            return f"F,{a1:.2f},{a2:.2f},{a3:.2f},{st}\n".encode("utf-8")
+        return f"F,{a1:.2f},{a2:.2f},{a3:.2f},{st},{self.seq}\n".encode("utf-8")
+
+    def tick(self, now: float) -> bytes:
+        """Advance the model to now and return the bytes delivered to the host."""
+        if self.next_fb_t is None:
+            self.next_fb_t = now
+
+        # apply commands and emit feedback in time order
+        while True:
+            t_cmd = self._inbox[0][0] if self._inbox else None
+            t_fb = self.next_fb_t if self.next_fb_t <= now else None
+            if t_cmd is not None and t_cmd > now:
+                t_cmd = None
+            if t_cmd is None and t_fb is None:
+                break
+            if t_fb is None or (t_cmd is not None and t_cmd <= t_fb):
+                self._integrate(t_cmd)
+                _, _, (cmd, seq) = heapq.heappop(self._inbox)
+                self.target = [clamp(a) for a in cmd]
+                if seq is not None:
+                    self.seq = seq
+            else:
+                self._integrate(t_fb)
+                self.next_fb_t += self.fb_period
+                if self.loss and self.rng.random() < self.loss:
+                    self.fb_lost += 1
+                    continue
+                self.fb_tx += 1
+                self._push(self._outbox, t_fb + self._delay(), self.feedback_bytes())
+        self._integrate(now)
+
+        out = bytearray()
+        while self._outbox and self._outbox[0][0] <= now:
+            out += heapq.heappop(self._outbox)[2]
+        return bytes(out)
+
+
+# =========================
+# In-process virtual port
+# =========================
+class SimSerial:
+    """
+    pyserial-like port backed by a SimController running on its own thread.
+
+    Supports the subset used by this project: read, write, in_waiting,
+    timeout, reset_input_buffer and close.
+    """
+
+    def __init__(self, ctrl=None, timeout=0.02, tick_hz=2000.0, **sim_kwargs):
+        self.ctrl = ctrl if ctrl is not None else SimController(**sim_kwargs)
+        self.timeout = timeout
+        self.tick_period = 1.0 / max(1.0, float(tick_hz))
+        self.is_open = True
+
+        self._rx = bytearray()
+        self._cv = threading.Condition()
+        self._lock = threading.Lock()   # guards ctrl between writer and tick threads
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="sim-controller", daemon=True)
+        self._thread.start()
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def write(self, data: bytes):
+        with self._lock:
+            self.ctrl.receive(bytes(data), time.monotonic())
+        return len(data)
+
+    def read(self, size=1):
+        with self._cv:
+            if not self._rx and self.timeout != 0:
+                self._cv.wait(self.timeout)
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+        return data
+
+    def reset_input_buffer(self):
+        with self._cv:
+            self._rx.clear()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        self.is_open = False
+
+    def _loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                out = self.ctrl.tick(time.monotonic())
+            if out:
+                with self._cv:
+                    self._rx += out
+                    self._cv.notify_all()
+            self._stop.wait(self.tick_period)
+
+
+# =========================
+# pty transport (Linux/macOS)
+# =========================
+def serve_pty(ctrl, tick_hz=2000.0, on_ready=None):
+    """
+    Expose ctrl on a pseudo-terminal until interrupted.
+
+    The slave device path is printed (and passed to on_ready) so any program
+    can open it with serial.Serial(path, BAUD) in place of the real port.
+    """
+    import select
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    print(f"[SIM] controller on {path}")
+    if on_ready is not None:
+        on_ready(path)
+
+    period = 1.0 / max(1.0, float(tick_hz))
+    try:
+        while True:
+            r, _, _ = select.select([master], [], [], period)
+            now = time.monotonic()
+            if r:
+                ctrl.receive(os.read(master, 4096), now)
+            out = ctrl.tick(now)
+            if out:
+                os.write(master, out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulated robot arm controller on a pty.")
+    ap.add_argument("--rate", type=float, default=180.0, help="slew limit, deg/s")
+    ap.add_argument("--tau", type=float, default=0.08, help="first-order lag, s")
+    ap.add_argument("--latency", type=float, default=0.005, help="one-way transport latency, s")
+    ap.add_argument("--jitter", type=float, default=0.002, help="uniform jitter added to latency, s")
+    ap.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    ap.add_argument("--fb-hz", type=float, default=100.0, help="feedback rate")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    ctrl = SimController(rate_deg_s=args.rate, tau_s=args.tau, latency_s=args.latency,
+                         jitter_s=args.jitter, loss=args.loss, fb_hz=args.fb_hz, seed=args.seed)
+    serve_pty(ctrl)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,333 @@
-import os, time, csv
+import os, time, csv, threading
+import numpy as np
 import pygame
 
 from .utils import safe_mkdir
+from .kinematics import fk_points_side
+from .render_cache import RingTrace, clip_points, draw_trace
+from .runlog import AsyncLogWriter, BinLogWriter, BIN_EXT, FeedbackLogWriter, SegmentCompressor, append_index
+from .vision_worker import VisionWorker
 
 
 # ===== UI / Camera settings =====
-# Set to False to run without any camera dependency.
+# Default for CameraPanel(enable=...). Set to False to run without any camera dependency.
 ENABLE_CAMERA = False
 
-# OpenCV availability flag (used by CameraPanel). If you do not need camera, keep False.
-HAS_CV2 = False
+# OpenCV availability flag (used by CameraPanel).
+HAS_CV2 = True
+try:
+    import cv2
+except Exception:
+    HAS_CV2 = False
 
 # Directory used to store runtime CSV logs.
 LOG_DIR = "logs"
 
 
+def open_camera(candidates, w, h):
+    """Open the first available camera index and request a (w, h) frame size; None if none opens."""
+    backend = cv2.CAP_DSHOW if os.name == "nt" else cv2.CAP_ANY
+    for idx in candidates:
+        cap = cv2.VideoCapture(idx, backend)
+        if cap is not None and cap.isOpened():
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+            return cap
+    return None
+
+
+# =========================
+# Threaded frame grabber
+# =========================
+class FrameGrabber:
+    """
+    Read frames from a cv2.VideoCapture on a background thread.
+
+    Only the newest frame is kept: `latest = (frame, t_monotonic, index)` is
+    replaced in one assignment, so a frame nobody picked up is simply
+    overwritten (counted in `dropped`). The render loop never waits on the
+    device.
+    """
+
+    def __init__(self, cap, max_fail=30):
+        self.cap = cap
+        self.max_fail = max(1, int(max_fail))
+        self.latest = None
+        self.ok = True
+        self.grabbed = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.capture_fps = 0.0
+
+        self._taken = 0          # index of the last frame handed out
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="camera-grab", daemon=True)
+        self._thread.start()
+
+    def take(self):
+        """Return (frame, t_monotonic) if a frame newer than the last one taken exists, else None."""
+        latest = self.latest
+        if latest is None or latest[2] == self._taken:
+            return None
+        frame, ts, idx = latest
+        self.dropped += idx - self._taken - 1
+        self._taken = idx
+        self.consumed += 1
+        return frame, ts
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _loop(self):
+        fails = 0
+        last_t = None
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            now = time.monotonic()
+            if not ret or frame is None:
+                fails += 1
+                if fails >= self.max_fail:
+                    self.ok = False
+                    return
+                time.sleep(0.01)
+                continue
+            fails = 0
+            self.grabbed += 1
+            self.latest = (frame, now, self.grabbed)
+            if last_t is not None and now > last_t:
+                fps = 1.0 / (now - last_t)
+                self.capture_fps = fps if self.capture_fps == 0 else 0.9 * self.capture_fps + 0.1 * fps
+            last_t = now
+
+
+# =========================
+# Motion detection
+# =========================
+class MotionDetector:
+    """
+    Frame-differencing motion detector on a downscaled grayscale image.
+
+    All working images and the row/column sums used for the moments are
+    allocated once for the (w, h) input size; `detect()` writes into them
+    with dst=/out= arguments and swaps the previous/current buffers instead of
+    copying. min_area is given in input pixels and scaled with the image.
+    """
+
+    def __init__(self, w, h, thresh=25, min_area=900, downscale=0.5):
+        self.w, self.h = int(w), int(h)
+        self.scale = float(downscale) if 0 < downscale <= 1 else 1.0
+        self.sw = max(1, int(round(self.w * self.scale)))
+        self.sh = max(1, int(round(self.h * self.scale)))
+        self.thresh = int(thresh)
+        self.min_count = max(1, int(min_area * self.scale * self.scale))
+
+        self.gray_full = np.empty((self.h, self.w), np.uint8)
+        self.cur = np.empty((self.sh, self.sw), np.uint8)
+        self.prev = np.empty((self.sh, self.sw), np.uint8)
+        self.diff = np.empty((self.sh, self.sw), np.uint8)
+        self.mask = np.empty((self.sh, self.sw), np.uint8)
+        self.col_sum = np.empty(self.sw, np.int64)
+        self.row_sum = np.empty(self.sh, np.int64)
+        self.xs = np.arange(self.sw, dtype=np.float64)
+        self.ys = np.arange(self.sh, dtype=np.float64)
+        self.primed = False
+
+        self.area = 0   # moving pixels in the last frame (input scale)
+
+    def reset(self):
+        self.primed = False
+
+    def detect(self, bgr):
+        """Return the motion centroid (cx, cy) in input coordinates, or None."""
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY, dst=self.gray_full)
+        cv2.resize(self.gray_full, (self.sw, self.sh), dst=self.cur, interpolation=cv2.INTER_AREA)
+        cv2.GaussianBlur(self.cur, (5, 5), 0, dst=self.cur)
+
+        if not self.primed:
+            self.prev, self.cur = self.cur, self.prev
+            self.primed = True
+            self.area = 0
+            return None
+
+        cv2.absdiff(self.cur, self.prev, dst=self.diff)
+        # binary 0/1 mask so the sums below are the raw image moments
+        cv2.threshold(self.diff, self.thresh, 1, cv2.THRESH_BINARY, dst=self.mask)
+        self.prev, self.cur = self.cur, self.prev
+
+        np.sum(self.mask, axis=0, out=self.col_sum)
+        m00 = int(self.col_sum.sum())
+        self.area = int(m00 / (self.scale * self.scale))
+        if m00 < self.min_count:
+            return None
+        np.sum(self.mask, axis=1, out=self.row_sum)
+        m10 = float(self.col_sum @ self.xs)
+        m01 = float(self.row_sum @ self.ys)
+        return (m10 / m00 / self.scale, m01 / m00 / self.scale)
+
+
+# =========================
+# Marker tracking
+# =========================
+# HSV ranges (OpenCV scale: H 0-179, S/V 0-255). Red wraps around H=0.
+MARKER_HSV = {
+    "green": [((40, 70, 50), (85, 255, 255))],
+    "red": [((0, 100, 60), (10, 255, 255)), ((170, 100, 60), (179, 255, 255))],
+}
+
+
+class MarkerTracker:
+    """
+    HSV color-threshold marker tracker with a predicted search window.
+
+    Each frame only a window around the position predicted from the last
+    center and velocity is searched. After lost_after consecutive misses the
+    next search covers the whole frame. The HSV and mask images are views
+    into buffers sized for the full frame, so a smaller window reuses them.
+
+    After every `track()` call:
+      conf - 0..1, marker pixel area relative to 2 * min_area (0 when lost)
+      roi  - (x, y, w, h) of the region that was searched
+    """
+
+    def __init__(self, w, h, color="green", min_area=60, roi_half=48, lost_after=3):
+        self.w, self.h = int(w), int(h)
+        self.ranges = [(np.array(lo, np.uint8), np.array(hi, np.uint8))
+                       for lo, hi in MARKER_HSV.get(color, MARKER_HSV["green"])]
+        self.min_area = max(1, int(min_area))
+        self.roi_half = max(8, int(roi_half))
+        self.lost_after = max(1, int(lost_after))
+
+        self.hsv_flat = np.empty(self.w * self.h * 3, np.uint8)
+        self.mask_flat = np.empty(self.w * self.h, np.uint8)
+        self.tmp_flat = np.empty(self.w * self.h, np.uint8)
+
+        self.center = None
+        self.vel = (0.0, 0.0)     # px/s
+        self.last_t = None
+        self.misses = self.lost_after
+        self.conf = 0.0
+        self.roi = (0, 0, self.w, self.h)
+
+    def _window(self, t):
+        if self.center is None or self.misses >= self.lost_after:
+            return 0, 0, self.w, self.h
+        dt = 0.0 if self.last_t is None else max(0.0, t - self.last_t)
+        px = self.center[0] + self.vel[0] * dt
+        py = self.center[1] + self.vel[1] * dt
+        # grow the window with speed and with each miss
+        half = self.roi_half * (1 + self.misses) + 0.5 * (abs(self.vel[0]) + abs(self.vel[1])) * dt
+        x0 = max(0, int(px - half))
+        y0 = max(0, int(py - half))
+        x1 = min(self.w, int(px + half) + 1)
+        y1 = min(self.h, int(py + half) + 1)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return 0, 0, self.w, self.h
+        return x0, y0, x1 - x0, y1 - y0
+
+    def track(self, bgr, t):
+        """Search one frame captured at monotonic time t; return (cx, cy) or None."""
+        x, y, rw, rh = self.roi = self._window(t)
+        n = rw * rh
+        hsv = self.hsv_flat[:n * 3].reshape(rh, rw, 3)
+        mask = self.mask_flat[:n].reshape(rh, rw)
+        cv2.cvtColor(bgr[y:y + rh, x:x + rw], cv2.COLOR_BGR2HSV, dst=hsv)
+        lo, hi = self.ranges[0]
+        cv2.inRange(hsv, lo, hi, dst=mask)
+        for lo, hi in self.ranges[1:]:
+            tmp = self.tmp_flat[:n].reshape(rh, rw)
+            cv2.inRange(hsv, lo, hi, dst=tmp)
+            cv2.bitwise_or(mask, tmp, dst=mask)
+
+        m = cv2.moments(mask, binaryImage=True)
+        area = m["m00"]
+        if area < self.min_area:
+            self.misses += 1
+            self.conf = 0.0
+            if self.misses >= self.lost_after:
+                self.center = None
+                self.vel = (0.0, 0.0)
+            return None
+
+        cx = x + m["m10"] / area
+        cy = y + m["m01"] / area
+        if self.center is not None and self.last_t is not None and t > self.last_t:
+            dt = t - self.last_t
+            vx = (cx - self.center[0]) / dt
+            vy = (cy - self.center[1]) / dt
+            self.vel = (0.5 * self.vel[0] + 0.5 * vx, 0.5 * self.vel[1] + 0.5 * vy)
+        self.center = (cx, cy)
+        self.last_t = t
+        self.misses = 0
+        self.conf = min(1.0, area / (2.0 * self.min_area))
+        return self.center
+
+    def stats_text(self):
+        x, y, rw, rh = self.roi
+        return f"MARKER conf={self.conf:.2f} roi={rw}x{rh}"
+
+
+def rot90_coord(cx, cy, w, h):
+    # Display mapping of CameraPanel.last_frame. The original path built it with
+    # surfarray.make_surface(np.rot90(rgb)); surfarray indexes [x, y], so the
+    # net effect is a horizontal mirror: x' = w - 1 - cx, y' = cy.
+    return ((w - 1 - cx), cy)
+
+
 # =========================
 # Camera Panel + Motion/Marker
 # =========================
 class CameraPanel:
-    def __init__(self, w, h, fps_limit=25, candidates=None):
+    def __init__(self, w, h, fps_limit=25, candidates=None, enable=ENABLE_CAMERA,
+                 motion_thresh=25, motion_min_area=900, motion_downscale=0.5,
+                 marker_color="green", marker_min_area=60, marker_roi_half=48,
+                 use_process=False):
         self.w, self.h = int(w), int(h)
         self.fps_limit = max(1, int(fps_limit))
         self.candidates = candidates or [0]
+        self.enable = bool(enable)
         self.cap = None
+        self.grabber = None
+        self.worker = None
         self.ok = False
-        self.last_frame = None   # pygame surface (rotated)
+        self.last_frame = None   # pygame surface (rotated), shares memory with rgb_buf
         self.raw_bgr = None      # bgr for cv
+        self.frame_ts = 0.0      # monotonic capture time of raw_bgr
+
+        # preallocated frame path: resize -> bgr_buf, BGR->RGB + mirror -> rgb_buf
+        self.bgr_buf = np.empty((self.h, self.w, 3), np.uint8)
+        self.rgb_buf = np.empty((self.h, self.w, 3), np.uint8)
         self.last_grab = 0.0
 
-        self.prev_gray = None
+        self.motion = MotionDetector(self.w, self.h, motion_thresh, motion_min_area, motion_downscale)
+        self.marker = MarkerTracker(self.w, self.h, marker_color, marker_min_area, marker_roi_half)
         self.motion_center = None   # (cx, cy) original coord
         self.marker_center = None   # (cx, cy) original coord
 
-        if ENABLE_CAMERA and HAS_CV2:
-            self._open_first_available()
+        if self.enable and HAS_CV2:
+            if use_process:
+                self.worker = VisionWorker(
+                    self.w, self.h, self.candidates, self.fps_limit,
+                    motion_kw=dict(thresh=motion_thresh, min_area=motion_min_area, downscale=motion_downscale),
+                    marker_kw=dict(color=marker_color, min_area=marker_min_area, roi_half=marker_roi_half),
+                )
+                self.ok = self.worker.wait_ready()
+            else:
+                self._open_first_available()
 
     def _open_first_available(self):
-        for idx in self.candidates:
-            cap = cv2.VideoCapture(idx, cv2.CAP_DSHOW)
-            if cap is not None and cap.isOpened():
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.w)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.h)
-                self.cap = cap
-                self.ok = True
-                return
-        self.ok = False
-        self.cap = None
+        self.cap = open_camera(self.candidates, self.w, self.h)
+        if self.cap is not None:
+            self.grabber = FrameGrabber(self.cap)
+        self.ok = self.cap is not None
 
     def close(self):
+        if self.worker is not None:
+            self.worker.stop()
+        self.worker = None
+        if self.grabber is not None:
+            self.grabber.stop()
+        self.grabber = None
         if self.cap is not None:
             try:
                 self.cap.release()
@@ -57,27 +336,85 @@ class CameraPanel:
         self.cap = None
         self.ok = False
 
-    def update(self):
-        if (not ENABLE_CAMERA) or (not HAS_CV2) or (not self.ok) or (self.cap is None):
+    def stats_text(self):
+        if self.worker is not None:
+            return self.worker.stats_text()
+        g = self.grabber
+        if g is None:
+            return "CAM: --"
+        return f"CAM {g.capture_fps:4.1f} fps  used={g.consumed} dropped={g.dropped}"
+
+    def update(self, mode=None):
+        """Pick up the newest frame and run the detector for mode ("MOTION", "MARKER" or None = both)."""
+        if self.worker is not None:
+            self._update_from_worker(mode)
+            return
+        if (not self.enable) or (not HAS_CV2) or (not self.ok) or (self.grabber is None):
+            return
+        if not self.grabber.ok:
+            self.ok = False
             return
 
-        now = time.time()
+        now = time.monotonic()
         if now - self.last_grab < (1 / self.fps_limit):
             return
+
+        got = self.grabber.take()
+        if got is None:
+            return
+        frame, self.frame_ts = got
         self.last_grab = now
 
-        ret, frame = self.cap.read()
-        if not ret or frame is None:
+        self.present(frame)
+        if mode in (None, "MOTION"):
+            self.motion_center = self.motion.detect(self.raw_bgr)
+        else:
+            self.motion.reset()
+            self.motion_center = None
+        if mode in (None, "MARKER"):
+            self.marker_center = self.marker.track(self.raw_bgr, self.frame_ts)
+        else:
+            self.marker_center = None
+
+    def _update_from_worker(self, mode):
+        w = self.worker
+        if not w.alive():
             self.ok = False
             return
+        w.set_mode(mode)
+        for kind, center, ts, conf in w.poll():
+            if kind == "MOTION":
+                self.motion_center = center
+            else:
+                self.marker_center = center
+                self.marker.conf = conf
+            self.frame_ts = ts
+        if mode == "MOTION":
+            self.marker_center = None
+        elif mode == "MARKER":
+            self.motion_center = None
+        w.read_frame(self.present)
+
+    def present(self, frame):
+        """
+        Bring a captured frame into raw_bgr and last_frame without per-frame allocations.
+
+        The grabber hands over a fresh array per frame, so a frame already at
+        (w, h) is used as raw_bgr directly; otherwise it is resized into
+        bgr_buf. The display image is written into rgb_buf, which last_frame
+        wraps via pygame.image.frombuffer, so the surface is never rebuilt.
+        """
+        if frame.shape[0] == self.h and frame.shape[1] == self.w:
+            self.raw_bgr = frame
+        else:
+            cv2.resize(frame, (self.w, self.h), dst=self.bgr_buf, interpolation=cv2.INTER_AREA)
+            self.raw_bgr = self.bgr_buf
+
+        cv2.cvtColor(self.raw_bgr, cv2.COLOR_BGR2RGB, dst=self.rgb_buf)
+        cv2.flip(self.rgb_buf, 1, dst=self.rgb_buf)
+        if self.last_frame is None:
+            self.last_frame = pygame.image.frombuffer(self.rgb_buf, (self.w, self.h), "RGB")
 
-        frame = cv2.resize(frame, (self.w, self.h), interpolation=cv2.INTER_AREA)
-        self.raw_bgr = frame.copy()
-
-    def rot90_coord(cx, cy, w, h):
-        # np.rot90 CCW: x' = cy, y' = (w - 1 - cx)
-        return (cy, (w - 1 - cx))
-    
     class Button:
           def __init__(self, rect, text):
               self.rect = pygame.Rect(rect)
@@ -118,29 +455,14 @@ def draw_robot_axes(screen, origin, theta_rad, axis_len=80, mono=None):
         screen.blit(mono.render("Xr", True, (0,220,255)), (int(xr[0]) + 6, int(xr[1]) - 10))
         screen.blit(mono.render("Yr", True, (0,220,255)), (int(yr[0]) + 6, int(yr[1]) - 10))
 
-def fk_points_side(angles_deg, link_lengths_px, base_xy):
-    a1, a2, a3 = angles_deg
-    L1, L2, L3 = link_lengths_px
-    bx, by = base_xy
-
-    r1 = np.deg2rad(a1)
-    r2 = np.deg2rad(a2)
-    r3 = np.deg2rad(a3)
-
-    t1 = r1
-    t2 = r1 + r2
-    t3 = r1 + r2 + r3
-
-    p0 = (bx, by)
-    p1 = (bx + L1*np.cos(t1), by - L1*np.sin(t1))
-    p2 = (p1[0] + L2*np.cos(t2), p1[1] - L2*np.sin(t2))
-    p3 = (p2[0] + L3*np.cos(t3), p2[1] - L3*np.sin(t3))
-    return p0, p1, p2, p3, t1
-
-
-def draw_virtual_robot(screen, x, y, w, h, angles_actual, cal, view_mode, ee_trace, font, mono):
-    draw_panel_border(screen, x, y, w, h, f"Virtual Robot (ACTUAL) [{view_mode}]", font)
+def robot_geometry(x, y, w, h, angles_actual, cal):
+    """
+    Screen-space pose of the virtual robot inside panel (x, y, w, h).
 
+    Returns a dict with base, pts (p0..p3), theta (link 1, rad), visual
+    angles, ee (end effector, float) and rect, a bounding pygame.Rect of
+    everything draw_robot_arm() paints.
+    """
     bx = int(x + w * float(cal["base"]["x_ratio"]))
     by = int(y + h - int(cal["base"]["y_margin"]))
     base = (bx, by)
@@ -154,22 +476,44 @@ def draw_virtual_robot(screen, x, y, w, h, angles_actual, cal, view_mode, ee_tra
     ll = cal["link_lengths_px"]
     link_lengths = (int(ll["l1"]), int(ll["l2"]), int(ll["l3"]))
 
-    ui = cal.get("ui", {})
-    if ui.get("show_world_axes", True):
-        draw_world_axes(screen, base, axis_len=90, mono=mono)
-
     p0, p1, p2, p3, theta = fk_points_side((a1v, a2v, a3v), link_lengths, base)
 
-    if ui.get("show_robot_axes", True):
-        draw_robot_axes(screen, base, theta, axis_len=80, mono=mono)
+    # robot axes end points (+ room for their labels) are part of the painted area
+    xs = [p0[0], p1[0], p2[0], p3[0], bx + 80*np.cos(theta), bx + 80*np.cos(theta + np.pi/2)]
+    ys = [p0[1], p1[1], p2[1], p3[1], by - 80*np.sin(theta), by - 80*np.sin(theta + np.pi/2)]
+    rect = pygame.Rect(int(min(xs)), int(min(ys)), int(max(xs) - min(xs)) + 1, int(max(ys) - min(ys)) + 1)
+    return {
+        "base": base, "pts": (p0, p1, p2, p3), "theta": theta, "visual": (a1v, a2v, a3v),
+        "ee": (float(p3[0]), float(p3[1])), "rect": rect.inflate(80, 60),
+    }
 
-    # EE trace
-    if ui.get("show_ee_trace", True) and len(ee_trace) >= 2:
-        pts = [(int(px), int(py)) for (px, py) in ee_trace]
-        clipped = [(px_, py_) for (px_, py_) in pts if x+6 <= px_ <= x+w-6 and y+6 <= py_ <= y+h-6]
-        if len(clipped) >= 2:
-            pygame.draw.lines(screen, (80,255,120), False, clipped, 2)
 
+def draw_robot_static(screen, x, y, w, h, cal, view_mode, font, mono):
+    """Parts of the robot panel that only depend on the calibration: frame, title, world axes."""
+    draw_panel_border(screen, x, y, w, h, f"Virtual Robot (ACTUAL) [{view_mode}]", font)
+    bx = int(x + w * float(cal["base"]["x_ratio"]))
+    by = int(y + h - int(cal["base"]["y_margin"]))
+    if cal.get("ui", {}).get("show_world_axes", True):
+        draw_world_axes(screen, (bx, by), axis_len=90, mono=mono)
+
+
+def draw_ee_trace(screen, x, y, w, h, ee_trace):
+    """ee_trace: RingTrace or (n, 2) points; points outside the panel (6 px margin) are dropped."""
+    if len(ee_trace) < 2:
+        return
+    bounds = (x+6, y+6, x+w-6, y+h-6)
+    if isinstance(ee_trace, RingTrace):
+        pts = ee_trace.screen_points(bounds)
+    else:
+        pts = clip_points(ee_trace, bounds)
+    draw_trace(screen, pts, (80,255,120), 2)
+
+
+def draw_robot_arm(screen, geom, cal, mono):
+    if cal.get("ui", {}).get("show_robot_axes", True):
+        draw_robot_axes(screen, geom["base"], geom["theta"], axis_len=80, mono=mono)
+
+    p0, p1, p2, p3 = geom["pts"]
     def ip(p): return (int(p[0]), int(p[1]))
     pygame.draw.line(screen, (0,220,255), ip(p0), ip(p1), 6)
     pygame.draw.line(screen, (0,220,255), ip(p1), ip(p2), 6)
@@ -180,55 +524,237 @@ def draw_virtual_robot(screen, x, y, w, h, angles_actual, cal, view_mode, ee_tra
         pygame.draw.circle(screen, (20,20,20), ip(pt), 7, 2)
     pygame.draw.circle(screen, (80,255,120), ip(p3), 10, 2)
 
-    screen.blit(mono.render(f"ACTUAL(raw)={tuple(angles_actual)}", True, (200,200,200)), (x+12, y+h-56))
-    screen.blit(mono.render(f"VISUAL(map)=({int(a1v)},{int(a2v)},{int(a3v)})", True, (160,160,160)), (x+12, y+h-32))
-    return (float(p3[0]), float(p3[1]))
+
+def robot_labels(angles_actual, geom):
+    """The two text rows under the robot: (raw angles, visual angles)."""
+    a1v, a2v, a3v = geom["visual"]
+    return f"ACTUAL(raw)={tuple(angles_actual)}", f"VISUAL(map)=({int(a1v)},{int(a2v)},{int(a3v)})"
+
+
+def draw_virtual_robot(screen, x, y, w, h, angles_actual, cal, view_mode, ee_trace, font, mono):
+    draw_robot_static(screen, x, y, w, h, cal, view_mode, font, mono)
+    geom = robot_geometry(x, y, w, h, angles_actual, cal)
+
+    # EE trace
+    if cal.get("ui", {}).get("show_ee_trace", True):
+        draw_ee_trace(screen, x, y, w, h, ee_trace)
+
+    draw_robot_arm(screen, geom, cal, mono)
+
+    raw, visual = robot_labels(angles_actual, geom)
+    screen.blit(mono.render(raw, True, (200,200,200)), (x+12, y+h-56))
+    screen.blit(mono.render(visual, True, (160,160,160)), (x+12, y+h-32))
+    return geom["ee"]
 
 
 # =========================
 # CSV Logger
 # =========================
 class RunLogger:
-    def __init__(self):
-        safe_mkdir(LOG_DIR)
-        ts = time.strftime("%Y%m%d_%H%M%S")
-        self.path = os.path.join(LOG_DIR, f"run_{ts}.csv")
-        self.f = open(self.path, "w", newline="", encoding="utf-8")
-        self.w = csv.writer(self.f)
-        self.w.writerow([
-            "t","strategy","source","mode",
-            "target_a1","target_a2","target_a3",
-            "actual_a1","actual_a2","actual_a3",
-            "err_a1","err_a2","err_a3",
-            "dx","dy"
-        ])
-        self.flush_every = 30   # 每30行强制写盘一次
+    def __init__(self, fmt="csv", async_write=False, overflow="drop_oldest", queue_max=4096, flush_interval=0.5,
+                 extra_cols=(), rotate_mb=0, rotate_s=0, compress=None, feedback=False,
+                 log_dir=LOG_DIR):
+        # fmt: "csv" (text, one row per frame) or "bin" (fixed-width records, see runlog.py)
+        # async_write: hand records to a background writer thread (see runlog.AsyncLogWriter)
+        # extra_cols: additional numeric columns, filled from log(..., extra=...)
+        # rotate_mb / rotate_s: start a new segment run_<ts>_NNN after that many MB / seconds (0 = never)
+        # compress: None, "gzip" or "lzma" - closed segments are compressed on a background thread
+        # log_dir: where segments, index.jsonl and the feedback log go (main/headless pass config.LOG_DIR)
+        # feedback: also write every feedback sample from log_feedback() to fb_<ts>.rlog (one file per run)
+        self.log_dir = log_dir
+        safe_mkdir(log_dir)
+        self.run_id = "run_" + time.strftime("%Y%m%d_%H%M%S")
+        self.fmt = fmt
+        self.extra_cols = list(extra_cols)
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024)
+        self.rotate_s = float(rotate_s)
         self.n = 0
-        self.f.flush()
-
-    def log(self, strategy, source, mode, target, actual, dx, dy):
-        t = int(time.time())
-        err = (target[0]-actual[0], target[1]-actual[1], target[2]-actual[2])
-        self.w.writerow([
-            t, strategy, source, mode,
-            target[0], target[1], target[2],
-            actual[0], actual[1], actual[2],
-            err[0], err[1], err[2],
-            dx, dy
-        ])
-        self.n += 1
-        if self.n % self.flush_every == 0:
+        self.part = 0
+        self.writer = None
+        self.seg = None
+        self.f = None
+        self.bw = None
+        self.compressor = SegmentCompressor(log_dir, compress)
+        # bin rows carry monotonic ns; keep a pair to put index times on the wall clock
+        self._t0_wall, self._t0_mono = time.time(), time.monotonic_ns()
+        self._open_segment()
+        if async_write:
+            self.writer = AsyncLogWriter(self._write_rows, self._flush, maxsize=queue_max,
+                                         policy=overflow, flush_interval=flush_interval)
+        self.fb_log = None
+        self.fb_writer = None
+        if feedback:
+            self.fb_log = FeedbackLogWriter(os.path.join(log_dir, self.run_id.replace("run_", "fb_", 1) + BIN_EXT))
+            if async_write:
+                self.fb_writer = AsyncLogWriter(self.fb_log.write_batches, self.fb_log.flush, maxsize=queue_max,
+                                                policy=overflow, flush_interval=flush_interval)
+
+    def _open_segment(self):
+        self.part += 1
+        rotating = self.rotate_bytes > 0 or self.rotate_s > 0
+        name = f"{self.run_id}_{self.part:03d}" if rotating else self.run_id
+        if self.fmt == "bin":
+            self.path = os.path.join(self.log_dir, name + BIN_EXT)
+            self.bw = BinLogWriter(self.path, extra_cols=self.extra_cols)
+        else:
+            self.path = os.path.join(self.log_dir, name + ".csv")
+            self.f = open(self.path, "w", newline="", encoding="utf-8")
+            self.w = csv.writer(self.f)
+            self.w.writerow([
+                "t","strategy","source","mode",
+                "target_a1","target_a2","target_a3",
+                "actual_a1","actual_a2","actual_a3",
+                "err_a1","err_a2","err_a3",
+                "dx","dy",
+                "rtt_ms","rtt_p95_ms"
+            ] + self.extra_cols)
+            self.flush_every = 30   # 每30行强制写盘一次
+            self.f.flush()
+        self.seg = {
+            "segment": os.path.basename(self.path), "run": self.run_id, "part": self.part,
+            "path": os.path.basename(self.path), "fmt": self.fmt, "state": "open",
+            "t_start": round(time.time(), 6), "t_end": None, "rows": 0,
+        }
+        self._seg_t0 = time.monotonic()
+        self._seg_first = None
+        self._seg_last = None
+        self._strategies = set()
+        self._modes = set()
+        try:
+            append_index(self.log_dir, self.seg)
+        except Exception:
+            pass
+
+    def _close_segment(self):
+        path = self.path
+        if self.fmt == "bin":
+            try:
+                self.bw.close()
+            except Exception:
+                pass
+        else:
             try:
                 self.f.flush()
+                self.f.close()
+            except Exception:
+                pass
+        seg = dict(self.seg)
+        self.seg = None
+        seg.update(state="closed", strategies=sorted(self._strategies), modes=sorted(self._modes))
+        if self._seg_first is not None:
+            seg["t_start"] = round(self._wall(self._seg_first), 6)
+            seg["t_end"] = round(self._wall(self._seg_last), 6)
+        else:
+            seg["t_end"] = seg["t_start"]
+        self.compressor.submit(path, seg)
+
+    def _wall(self, t):
+        if self.fmt == "bin":
+            return self._t0_wall + (t - self._t0_mono) / 1e9
+        return t
+
+    def _segment_full(self):
+        if self.rotate_s > 0 and time.monotonic() - self._seg_t0 >= self.rotate_s:
+            return True
+        if self.rotate_bytes > 0:
+            if self.fmt == "bin":
+                size = self.bw.offset + self.bw.rows * self.bw.dtype.itemsize
+            else:
+                size = self.f.tell()
+            return size >= self.rotate_bytes
+        return False
+
+    def log(self, strategy, source, mode, target, actual, dx, dy, rtt_ms="", rtt_p95_ms="", extra=()):
+        # timestamp is taken here, not when the row reaches the disk (CSV: wall clock, us resolution)
+        t = time.monotonic_ns() if self.fmt == "bin" else round(time.time(), 6)
+        rec = (t, strategy, source, mode, tuple(target), tuple(actual), dx, dy, rtt_ms, rtt_p95_ms, tuple(extra))
+        self.n += 1
+        if self.writer is not None:
+            self.writer.put(rec)
+            return
+        self._write_rows((rec,))
+        if self.fmt != "bin" and self.n % self.flush_every == 0:
+            try:
+                self._flush()
             except Exception:
                 pass
 
-    def close(self):
-        try:
+    def log_feedback(self, t, records):
+        # one batch from SerialEngine.drain_history(): receive times + FB_DTYPE records
+        if self.fb_log is None or not len(records):
+            return
+        if self.fb_writer is not None:
+            self.fb_writer.put((t, records))
+            return
+        self.fb_log.append(t, records)
+
+    def _write_rows(self, recs):
+        # runs on whichever thread writes (caller or AsyncLogWriter), which also owns rotation
+        if self.rotate_bytes > 0 or self.rotate_s > 0:
+            # check the limits after every row, so a segment passes rotate_mb by at most
+            # one row; the next segment is opened when a row for it arrives, never empty
+            for rec in recs:
+                if self.seg is None:
+                    self._open_segment()
+                self._append_rows((rec,))
+                if self._segment_full():
+                    self._close_segment()
+        elif recs:
+            self._append_rows(recs)
+
+    def _append_rows(self, recs):
+        if recs:
+            if self._seg_first is None:
+                self._seg_first = recs[0][0]
+            self._seg_last = recs[-1][0]
+            self.seg["rows"] += len(recs)
+            for r in recs:
+                self._strategies.add(r[1])
+                self._modes.add(r[3])
+        if self.fmt == "bin":
+            for (t, strategy, source, mode, target, actual, dx, dy, rtt_ms, rtt_p95_ms, extra) in recs:
+                self.bw.append(strategy, source, mode, target, actual, dx, dy, rtt_ms, rtt_p95_ms, t_ns=t, extra=extra)
+        else:
+            rows = []
+            for (t, strategy, source, mode, target, actual, dx, dy, rtt_ms, rtt_p95_ms, extra) in recs:
+                err = (target[0]-actual[0], target[1]-actual[1], target[2]-actual[2])
+                rows.append([
+                    t, strategy, source, mode,
+                    target[0], target[1], target[2],
+                    actual[0], actual[1], actual[2],
+                    err[0], err[1], err[2],
+                    dx, dy,
+                    rtt_ms, rtt_p95_ms
+                ] + list(extra))
+            self.w.writerows(rows)
+
+    def _flush(self):
+        if self.seg is None:
+            return
+        if self.fmt == "bin":
+            self.bw.flush()
+        else:
             self.f.flush()
-        except Exception:
-            pass
-        try:
-            self.f.close()
-        except Exception:
-            pass
+
+    def stats_text(self):
+        seg = f" seg={self.part}" if self.part > 1 else ""
+        if self.writer is None:
+            return f"rows={self.n}{seg}"
+        return self.writer.stats_text() + seg
+
+    def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        if self.seg is not None:
+            self._close_segment()
+        for closer in (self.fb_writer.close if self.fb_writer is not None else None,
+                       self.fb_log.close if self.fb_log is not None else None,
+                       self.compressor.close):
+            try:
+                if closer is not None:
+                    closer()
+            except Exception:
+                pass
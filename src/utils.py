@@ -8,6 +8,8 @@ DEFAULT_CAL = {
     "link_lengths_px": {"l1": 160, "l2": 120, "l3": 90},
     "view_mode_default": "SIDE",
     "ui": {"show_world_axes": True, "show_robot_axes": True, "show_ee_trace": True},
+    # IK control mode: camera image -> workspace rectangle (robot px, y up), tool angle, elbow (0 = auto)
+    "ik": {"x_range_px": [-150, 150], "y_range_px": [-20, 140], "phi_deg": -90, "elbow": 0, "grid_step_px": 2}
 }
 
 # Calibration file path (relative to project root).
@@ -1,12 +1,29 @@
 import os
 import glob
+import io
+import json
+import time
+import argparse
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from .runlog import (
+    BIN_EXT, latest_segment, open_bin_log, open_maybe_compressed, read_header, segments_between,
+    strip_compress_ext, to_frame,
+)
+from .kinematics import cal_link_lengths, cal_zero_deg, ee_error_batch
+from .utils import CAL_PATH, load_calibration
+from .config import LOG_DIR
+
 
-LOG_DIR = "logs"
 OUT_DIR = "validation_out"
 
+CHUNK_ROWS = 200_000        # rows per chunk in streaming mode
+ERR_THRESH_DEG = 5.0        # |error| above this counts towards "time over threshold"
+EE_THRESH_PX = 20.0         # same for the end-effector position error
+STREAM_AUTO_MB = 256        # logs larger than this are always streamed
+
 
 def find_latest_run_csv(log_dir: str = LOG_DIR) -> str | None:
     """Return the newest run_*.csv file path under log_dir, or None."""
@@ -17,6 +34,44 @@ def find_latest_run_csv(log_dir: str = LOG_DIR) -> str | None:
     return max(files, key=os.path.getmtime)
 
 
+def find_latest_run(log_dir: str = LOG_DIR) -> str | None:
+    """
+    Return the newest run log segment under log_dir, or None.
+
+    Uses logs/index.jsonl when present; otherwise falls back to globbing
+    run_*.csv / run_*.rlog (optionally .gz / .xz) and comparing mtimes.
+    """
+    path = latest_segment(log_dir)
+    if path is not None:
+        return path
+    files = glob_runs(log_dir)
+    if not files:
+        return None
+    return max(files, key=os.path.getmtime)
+
+
+def glob_runs(log_dir: str = LOG_DIR) -> list[str]:
+    """Every run_*.csv / run_*.rlog segment under log_dir, compressed or not (unordered)."""
+    files = []
+    for ext in (".csv", BIN_EXT):
+        for z in ("", ".gz", ".xz"):
+            files += glob.glob(os.path.join(log_dir, f"run_*{ext}{z}"))
+    return files
+
+
+def find_runs_between(t0: float | None, t1: float | None, log_dir: str = LOG_DIR) -> list[str]:
+    """Segments whose time range overlaps [t0, t1] (wall-clock seconds), from the run index."""
+    return segments_between(log_dir, t0, t1)
+
+
+def load_run(path: str) -> pd.DataFrame:
+    """Load a run log; binary logs are memory-mapped instead of parsed. .gz / .xz segments are decompressed."""
+    if strip_compress_ext(path).endswith(BIN_EXT):
+        hdr, rec = open_bin_log(path)
+        return to_frame(hdr, rec)
+    return pd.read_csv(path)
+
+
 def ensure_out_dir(path: str = OUT_DIR):
     os.makedirs(path, exist_ok=True)
 
@@ -76,12 +131,159 @@ def save_error_over_time(df: pd.DataFrame, out_dir: str):
             plt.close()
 
 
-def print_summary(df: pd.DataFrame):
+# =========================
+# Fast plotting (downsampled, Agg)
+# =========================
+PLOT_WIDTH_PX = 1600        # one plotted point (LTTB) or two (min/max) per horizontal pixel
+FAST_PLOT_ROWS = 200_000    # longer runs use the fast plot path automatically
+
+
+def downsample_minmax(x: np.ndarray, y: np.ndarray, n_px: int):
+    """Keep the min and max of y in each of n_px index buckets (spikes survive, in time order)."""
+    n = len(y)
+    if n <= 2 * n_px:
+        return x, y
+    k = int(np.ceil(n / n_px))
+    m = (n // k) * k
+    blocks = y[:m].reshape(-1, k)
+    base = np.arange(0, m, k)
+    idx = [base + np.nanargmin(blocks, axis=1), base + np.nanargmax(blocks, axis=1)]
+    if m < n:
+        tail = y[m:]
+        idx.append(np.array([m + np.nanargmin(tail), m + np.nanargmax(tail)]))
+    idx = np.unique(np.concatenate(idx))
+    return x[idx], y[idx]
+
+
+def downsample_lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """Largest-Triangle-Three-Buckets: n_out points that preserve the visual shape of (x, y)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nhi].mean()
+        avg_y = y[hi:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area)) if hi > lo else lo
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def _decimate(x, y, method, width_px):
+    ok = ~np.isnan(y)
+    x, y = x[ok], y[ok]
+    if method == "minmax":
+        return downsample_minmax(x, y, width_px)
+    return downsample_lttb(x, y, width_px)
+
+
+def _joint_series(df: pd.DataFrame, method: str, width_px: int):
+    """Per joint: downsampled target/actual/error series and the x-axis label."""
+    if "t" in df.columns:
+        t = pd.to_numeric(df["t"], errors="coerce").to_numpy(np.float64)
+        x, xlabel = t - t[0], "Time (s)"
+    else:
+        x, xlabel = np.arange(len(df), dtype=np.float64), "Sample"
+    out = {}
+    for j in RunErrorStats.JOINTS:
+        series = {}
+        for name, col in (("Target", f"target_{j}"), ("Actual", f"actual_{j}")):
+            if col in df.columns:
+                series[name] = _decimate(x, df[col].to_numpy(np.float64), method, width_px)
+        err = joint_error(df, j)
+        if err is not None:
+            series["Error"] = _decimate(x, err.to_numpy(np.float64), method, width_px)
+        if series:
+            out[j] = series
+    return out, xlabel
+
+
+def _draw_joint(ax_angle, ax_err, j, series, xlabel):
+    for name in ("Target", "Actual"):
+        if name in series:
+            ax_angle.plot(*series[name], label=name, linewidth=0.8)
+    ax_angle.set_title(f"Target vs Actual ({j.upper()})")
+    ax_angle.set_ylabel("Angle (deg)")
+    ax_angle.legend(loc="upper right")
+    if "Error" in series:
+        ax_err.plot(*series["Error"], label="Error", linewidth=0.8, color="tab:red")
+    ax_err.set_title(f"Tracking Error ({j.upper()})")
+    ax_err.set_ylabel("Error (deg)")
+    ax_angle.set_xlabel(xlabel)
+    ax_err.set_xlabel(xlabel)
+
+
+def _render_joint_png(args):
+    """Process-pool job: one joint's two panels into its own PNG."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    j, series, xlabel, path, width_px = args
+    fig = Figure(figsize=(width_px / 100, 3.2), dpi=100)
+    FigureCanvasAgg(fig)
+    ax_angle, ax_err = fig.subplots(1, 2)
+    _draw_joint(ax_angle, ax_err, j, series, xlabel)
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def save_fast_plots(df: pd.DataFrame, out_dir: str, method: str = "lttb",
+                    width_px: int = PLOT_WIDTH_PX, jobs: int = 0) -> list[str]:
+    """
+    Downsample every series to ~width_px points and render with Agg.
+
+    jobs=0: one multi-panel figure (joints x [angles, error]) -> overview.png.
+    jobs>0: one figure per joint, rendered in a process pool of that size.
+    Returns the written paths.
+    """
+    series, xlabel = _joint_series(df, method, width_px)
+    if not series:
+        return []
+    if jobs > 0:
+        from concurrent.futures import ProcessPoolExecutor
+
+        work = [(j, s, xlabel, os.path.join(out_dir, f"fast_{j}.png"), width_px) for j, s in series.items()]
+        with ProcessPoolExecutor(max_workers=min(jobs, len(work))) as pool:
+            return list(pool.map(_render_joint_png, work))
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(width_px / 100, 3.0 * len(series)), dpi=100)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(len(series), 2, squeeze=False)
+    for row, (j, s) in enumerate(series.items()):
+        _draw_joint(axes[row][0], axes[row][1], j, s, xlabel)
+    fig.tight_layout()
+    path = os.path.join(out_dir, "overview.png")
+    fig.savefig(path)
+    return [path]
+
+
+def ee_error(df: pd.DataFrame, cal: dict | None):
+    """End-effector position error |FK(actual) - FK(target)| in px per row, or None."""
+    cols = [f"{k}_{j}" for k in ("target", "actual") for j in ("a1", "a2", "a3")]
+    if cal is None or not all(c in df.columns for c in cols):
+        return None
+    target = df[cols[:3]].to_numpy(np.float64)
+    actual = df[cols[3:]].to_numpy(np.float64)
+    return ee_error_batch(target, actual, cal_link_lengths(cal), cal_zero_deg(cal))[2]
+
+
+def print_summary(df: pd.DataFrame, cal: dict | None = None):
     """
     Print simple numeric summary:
     - mean absolute error
     - max absolute error
-    for each joint when data is available.
+    for each joint when data is available, and for the end-effector
+    position (px, via forward kinematics) when a calibration is given.
     """
     joints = ["a1", "a2", "a3"]
 
@@ -104,23 +306,620 @@ def print_summary(df: pd.DataFrame):
         mx = abs_err.max()
         print(f"- {j.upper()}: MAE={mae:.3f} deg, MaxAbs={mx:.3f} deg")
 
+    ee = ee_error(df, cal)
+    if ee is not None and len(ee):
+        print(f"- EE: MAE={np.nanmean(ee):.3f} px, MaxAbs={np.nanmax(ee):.3f} px")
+
+
+# =========================
+# Streaming statistics (constant memory)
+# =========================
+def iter_run_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """Yield a run log as DataFrames of at most chunk_rows rows, without loading the whole file."""
+    if strip_compress_ext(path).endswith(BIN_EXT):
+        hdr, dtype, offset = read_header(path)
+        with open_maybe_compressed(path) as f:
+            f.read(offset)
+            while True:
+                buf = f.read(dtype.itemsize * chunk_rows)
+                n = len(buf) // dtype.itemsize
+                if n:
+                    yield to_frame(hdr, np.frombuffer(buf, dtype=dtype, count=n))
+                if n < chunk_rows:
+                    return
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+class ErrorSketch:
+    """
+    Fixed-size log-bucketed histogram of |error| for approximate percentiles.
+
+    Buckets grow by GAMMA, so a reported percentile is within ~1% of the
+    true value between LO and HI degrees; memory does not depend on the
+    number of samples.
+    """
+
+    LO, HI, GAMMA = 1e-3, 1e3, 1.02
+
+    def __init__(self):
+        n = int(np.ceil(np.log(self.HI / self.LO) / np.log(self.GAMMA))) + 1
+        self.edges = self.LO * self.GAMMA ** np.arange(n)
+        self.counts = np.zeros(n + 1, np.int64)
+
+    def add(self, a: np.ndarray):
+        idx = np.searchsorted(self.edges, a, side="right")
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def merge(self, other: "ErrorSketch"):
+        self.counts += other.counts
+
+    def quantile(self, q: float) -> float:
+        n = int(self.counts.sum())
+        if n == 0:
+            return float("nan")
+        i = int(np.searchsorted(np.cumsum(self.counts), max(1, int(np.ceil(q * n)))))
+        if i == 0:
+            return 0.0
+        if i >= len(self.edges):
+            return float(self.HI)
+        return float(np.sqrt(self.edges[i - 1] * self.edges[i]))
+
+
+class JointErrorStats:
+    """Running |error| statistics for one joint: MAE, max, RMS, percentiles, time over threshold."""
+
+    def __init__(self, thresh: float = ERR_THRESH_DEG):
+        self.thresh = thresh
+        self.n = 0
+        self.sum_abs = 0.0
+        self.sum_sq = 0.0
+        self.max = float("nan")
+        self.sketch = ErrorSketch()
+        self.t_over = 0.0
+
+    def update(self, err: np.ndarray, dt: np.ndarray | None = None):
+        """err: signed errors; dt: time since the previous sample, counted when |err| > thresh."""
+        err = np.asarray(err, dtype=np.float64)
+        ok = ~np.isnan(err)
+        a = np.abs(err[ok])
+        if len(a) == 0:
+            return
+        self.n += len(a)
+        self.sum_abs += float(a.sum())
+        self.sum_sq += float(np.dot(a, a))
+        m = float(a.max())
+        self.max = m if np.isnan(self.max) else max(self.max, m)
+        self.sketch.add(a)
+        if dt is not None:
+            self.t_over += float(np.nansum(np.asarray(dt)[ok][a > self.thresh]))
+
+    def merge(self, other: "JointErrorStats"):
+        self.n += other.n
+        self.sum_abs += other.sum_abs
+        self.sum_sq += other.sum_sq
+        if not np.isnan(other.max):
+            self.max = other.max if np.isnan(self.max) else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        self.t_over += other.t_over
+
+    @property
+    def mae(self) -> float:
+        return self.sum_abs / self.n if self.n else float("nan")
+
+    @property
+    def rms(self) -> float:
+        return float(np.sqrt(self.sum_sq / self.n)) if self.n else float("nan")
+
+    def to_dict(self) -> dict:
+        nz = np.flatnonzero(self.sketch.counts)
+        return {"thresh": self.thresh, "n": self.n, "sum_abs": self.sum_abs, "sum_sq": self.sum_sq,
+                "max": None if np.isnan(self.max) else self.max, "t_over": self.t_over,
+                "sketch": [[int(i), int(self.sketch.counts[i])] for i in nz]}
+
+    @classmethod
+    def from_dict(cls, d: dict, thresh: float = ERR_THRESH_DEG) -> "JointErrorStats":
+        st = cls(d.get("thresh", thresh))
+        st.n, st.sum_abs, st.sum_sq, st.t_over = d["n"], d["sum_abs"], d["sum_sq"], d["t_over"]
+        st.max = float("nan") if d["max"] is None else d["max"]
+        for i, c in d["sketch"]:
+            st.sketch.counts[i] = c
+        return st
+
+
+def joint_error(df: pd.DataFrame, j: str):
+    """Error series for joint j (err_<j>, or actual - target), or None."""
+    if f"err_{j}" in df.columns:
+        return df[f"err_{j}"]
+    if f"target_{j}" in df.columns and f"actual_{j}" in df.columns:
+        return df[f"actual_{j}"] - df[f"target_{j}"]
+    return None
+
+
+class RunErrorStats:
+    """
+    Per-joint JointErrorStats fed chunk by chunk.
+
+    With group_by=True the same statistics are also kept per
+    (strategy, mode) pair, so runs can be compared by control strategy.
+    With a calibration, an "ee" entry tracks the end-effector position
+    error in px alongside the joints.
+    """
+
+    JOINTS = ("a1", "a2", "a3")
+
+    def __init__(self, thresh: float = ERR_THRESH_DEG, group_by: bool = False, cal: dict | None = None,
+                 ee_thresh: float = EE_THRESH_PX):
+        self.thresh = thresh
+        self.group_by = group_by
+        self.cal = cal
+        self.ee_thresh = ee_thresh
+        self.joints = self._new_stats()
+        self.groups = {}        # (strategy, mode) -> {joint: JointErrorStats}
+        self.rows = 0
+        self.t_first = None
+        self.t_last = None
+
+    def _new_stats(self):
+        stats = {j: JointErrorStats(self.thresh) for j in self.JOINTS}
+        if self.cal is not None:
+            stats["ee"] = JointErrorStats(self.ee_thresh)
+        return stats
+
+    def update(self, df: pd.DataFrame):
+        if len(df) == 0:
+            return
+        self.rows += len(df)
+        dt = None
+        if "t" in df.columns:
+            t = pd.to_numeric(df["t"], errors="coerce").to_numpy(np.float64)
+            prev = t[0] if self.t_last is None else self.t_last
+            dt = np.diff(t, prepend=prev)
+            if self.t_first is None:
+                self.t_first = float(t[0])
+            self.t_last = float(t[-1])
+        errs = {}
+        for j in self.JOINTS:
+            err = joint_error(df, j)
+            if err is not None:
+                errs[j] = pd.to_numeric(err, errors="coerce").to_numpy(np.float64)
+                self.joints[j].update(errs[j], dt)
+        ee = ee_error(df, self.cal)
+        if ee is not None:
+            errs["ee"] = ee
+            self.joints["ee"].update(ee, dt)
+        if self.group_by and "strategy" in df.columns and "mode" in df.columns:
+            keys = df[["strategy", "mode"]].fillna("").astype(str)
+            for key, idx in keys.groupby(["strategy", "mode"], sort=False).indices.items():
+                g = self.groups.get(key)
+                if g is None:
+                    g = self.groups[key] = self._new_stats()
+                for j, e in errs.items():
+                    g[j].update(e[idx], None if dt is None else dt[idx])
+
+    def print_summary(self):
+        """Same lines as print_summary(df), followed by the streaming-only statistics."""
+        print("\n=== Validation Summary ===")
+        for j, st in self.joints.items():
+            unit = "px" if j == "ee" else "deg"
+            if st.n == 0:
+                if j != "ee":
+                    print(f"- {j.upper()}: (no data columns found)")
+                continue
+            print(f"- {j.upper()}: MAE={st.mae:.3f} {unit}, MaxAbs={st.max:.3f} {unit}")
+        for j, st in self.joints.items():
+            unit = "px" if j == "ee" else "deg"
+            if st.n:
+                q = st.sketch.quantile
+                print(f"  {j.upper()}: RMS={st.rms:.3f}  P50={q(0.50):.3f}  P95={q(0.95):.3f}  P99={q(0.99):.3f} {unit}"
+                      f"  >{st.thresh:g}{unit} for {st.t_over:.2f} s")
+
+    def to_dict(self) -> dict:
+        return {
+            "thresh": self.thresh, "ee_cal": _cal_key(self.cal), "rows": self.rows, "t_first": self.t_first, "t_last": self.t_last,
+            "joints": {j: st.to_dict() for j, st in self.joints.items()},
+            "groups": [{"strategy": k[0], "mode": k[1], "joints": {j: st.to_dict() for j, st in g.items()}}
+                       for k, g in self.groups.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RunErrorStats":
+        rs = cls(d["thresh"], group_by=True)
+        rs.ee_thresh = d["joints"].get("ee", {}).get("thresh", EE_THRESH_PX)
+        rs.rows, rs.t_first, rs.t_last = d["rows"], d["t_first"], d["t_last"]
+        rs.joints = {j: JointErrorStats.from_dict(v, rs.thresh) for j, v in d["joints"].items()}
+        for g in d["groups"]:
+            rs.groups[(g["strategy"], g["mode"])] = {
+                j: JointErrorStats.from_dict(v, rs.thresh) for j, v in g["joints"].items()}
+        return rs
+
+
+def _cal_key(cal: dict | None):
+    """Calibration values the EE statistics depend on (part of the cache key)."""
+    if cal is None:
+        return None
+    return list(cal_link_lengths(cal) + cal_zero_deg(cal))
+
+
+def stream_summary(path: str, chunk_rows: int = CHUNK_ROWS, thresh: float = ERR_THRESH_DEG,
+                   group_by: bool = False, cal: dict | None = None) -> RunErrorStats:
+    """Compute RunErrorStats for a log of any size in constant memory."""
+    stats = RunErrorStats(thresh, group_by, cal)
+    for chunk in iter_run_chunks(path, chunk_rows):
+        stats.update(chunk)
+    return stats
+
+
+# =========================
+# Batch validation (many runs, process pool, cache)
+# =========================
+CACHE_NAME = "summary_cache.json"
+
+
+def list_runs(log_dir: str = LOG_DIR, pattern: str | None = None,
+              since: float | None = None, until: float | None = None) -> list[str]:
+    """
+    Run log segments to validate, oldest first.
+
+    pattern is a glob relative to log_dir; since/until (wall seconds) use the
+    run index, or the run_<YYYYmmdd_HHMMSS> file name when there is no index.
+    """
+    if pattern is None and (since is not None or until is not None):
+        paths = segments_between(log_dir, since, until)
+        if paths:
+            return paths
+    if pattern is not None:
+        files = glob.glob(os.path.join(log_dir, pattern))
+    else:
+        files = glob_runs(log_dir)
+    out = []
+    for p in files:
+        t = _run_start_time(p)
+        if (since is not None and t < since) or (until is not None and t > until):
+            continue
+        out.append((t, p))
+    return [p for _, p in sorted(out)]
+
+
+def _run_start_time(path: str) -> float:
+    stem = os.path.basename(path)[4:19]     # run_YYYYmmdd_HHMMSS...
+    try:
+        return time.mktime(time.strptime(stem, "%Y%m%d_%H%M%S"))
+    except ValueError:
+        return os.path.getmtime(path)
+
+
+def _parse_when(s: str | None) -> float | None:
+    """'2025-01-31' or '2025-01-31 14:00' (local time) -> epoch seconds."""
+    if not s:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(s, fmt))
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised date: {s!r}")
+
+
+def _summarize_job(args):
+    path, chunk_rows, thresh, cal = args
+    return stream_summary(path, chunk_rows, thresh, group_by=True, cal=cal).to_dict()
+
+
+def load_cache(out_dir: str = OUT_DIR) -> dict:
+    try:
+        with open(os.path.join(out_dir, CACHE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def stale_cache_keys(cache: dict) -> list[str]:
+    """Cache keys whose run file no longer exists (deleted or rotated away)."""
+    return [k for k in cache if not os.path.exists(k)]
+
+
+def save_cache(cache: dict, out_dir: str = OUT_DIR):
+    """Write the cache atomically, dropping entries for runs that no longer exist."""
+    for k in stale_cache_keys(cache):
+        del cache[k]
+    ensure_out_dir(out_dir)
+    tmp = os.path.join(out_dir, CACHE_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, os.path.join(out_dir, CACHE_NAME))
+
+
+def summarize_runs(paths: list[str], jobs: int | None = None, chunk_rows: int = CHUNK_ROWS,
+                   thresh: float = ERR_THRESH_DEG, out_dir: str = OUT_DIR, cal: dict | None = None) -> dict:
+    """
+    Return {path: RunErrorStats} for paths, computing only runs missing from the cache.
+
+    Cache entries are keyed by absolute path and reused while size, mtime,
+    threshold and calibration are unchanged. New work is spread over a
+    process pool.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    cache = load_cache(out_dir)
+    out, todo = {}, []
+    for p in paths:
+        st = os.stat(p)
+        key = os.path.abspath(p)
+        e = cache.get(key)
+        if (e and e["size"] == st.st_size and e["mtime"] == st.st_mtime and e["summary"]["thresh"] == thresh
+                and e["summary"].get("ee_cal") == _cal_key(cal)):
+            out[p] = RunErrorStats.from_dict(e["summary"])
+        else:
+            todo.append((p, key, st))
+    print(f"[OK] {len(paths)} runs: {len(paths) - len(todo)} cached, {len(todo)} to process")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(_summarize_job, [(p, chunk_rows, thresh, cal) for p, _, _ in todo])
+            for (p, key, st), d in zip(todo, results):
+                cache[key] = {"size": st.st_size, "mtime": st.st_mtime, "summary": d}
+                out[p] = RunErrorStats.from_dict(d)
+    if todo or stale_cache_keys(cache):
+        save_cache(cache, out_dir)
+    return out
+
+
+def batch_report(summaries: dict, out_dir: str = OUT_DIR):
+    """Print and save per-run and per-(strategy, mode) tables."""
+    runs = []
+    groups = {}
+    for p, rs in summaries.items():
+        row = {"run": os.path.basename(p), "rows": rs.rows,
+               "duration_s": (rs.t_last - rs.t_first) if rs.t_first is not None else np.nan}
+        for j, st in rs.joints.items():
+            row[f"mae_{j}"] = st.mae
+            row[f"max_{j}"] = st.max
+        runs.append(row)
+        for key, g in rs.groups.items():
+            agg = groups.setdefault(key, ({}, set()))
+            agg[1].add(p)
+            for j, st in g.items():
+                agg[0].setdefault(j, JointErrorStats(st.thresh)).merge(st)
+
+    grows = []
+    for (strategy, mode), (joints, members) in sorted(groups.items()):
+        row = {"strategy": strategy, "mode": mode, "runs": len(members),
+               "rows": max(st.n for st in joints.values())}
+        for j, st in joints.items():
+            row[f"mae_{j}"] = st.mae
+            row[f"p95_{j}"] = st.sketch.quantile(0.95)
+            row[f"max_{j}"] = st.max
+            row[f"over_s_{j}"] = st.t_over
+        grows.append(row)
+
+    df_runs = pd.DataFrame(runs)
+    df_groups = pd.DataFrame(grows)
+    ensure_out_dir(out_dir)
+    df_runs.to_csv(os.path.join(out_dir, "batch_runs.csv"), index=False)
+    df_groups.to_csv(os.path.join(out_dir, "batch_groups.csv"), index=False)
+
+    with pd.option_context("display.width", 200, "display.max_columns", 50, "display.float_format", "{:.3f}".format):
+        print("\n=== Runs ===")
+        print(df_runs.to_string(index=False) if len(df_runs) else "(none)")
+        print("\n=== By strategy / mode ===")
+        print(df_groups.to_string(index=False) if len(df_groups) else "(none)")
+    print(f"\n[OK] Reports saved to: {out_dir}")
+
+
+# =========================
+# Live follow mode
+# =========================
+FOLLOW_POLL_S = 0.5         # how often the active log is checked for new bytes
+ALARM_HOLD_S = 0.5          # |error| must stay above threshold this long to raise an alarm
+
+
+class LogTail:
+    """
+    Incremental reader for a run log that is still being written.
+
+    Each poll() reads only the bytes appended since the previous call and
+    returns the complete rows among them (a partial trailing line/record is
+    kept for the next poll) as a DataFrame, or None when nothing new arrived.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.bin = path.endswith(BIN_EXT)
+        self.pos = 0
+        self.pending = b""
+        self.header = None
+        self.rows = 0
+        if self.bin:
+            self.hdr, self.dtype, self.pos = read_header(path)
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None             # rotated away / compressed
+        if size <= self.pos:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(self.pos)
+            data = self.pending + f.read(size - self.pos)
+        self.pos = size
+
+        if self.bin:
+            n = len(data) // self.dtype.itemsize
+            self.pending = data[n * self.dtype.itemsize:]
+            if n == 0:
+                return None
+            self.rows += n
+            return to_frame(self.hdr, np.frombuffer(data, dtype=self.dtype, count=n))
+
+        end = data.rfind(b"\n") + 1
+        self.pending = data[end:]
+        if end == 0:
+            return None
+        body = data[:end]
+        if self.header is None:
+            nl = body.find(b"\n")
+            self.header = body[:nl].decode("utf-8").strip().split(",")
+            body = body[nl + 1:]
+            if not body:
+                return None
+        df = pd.read_csv(io.BytesIO(body), header=None, names=self.header)
+        self.rows += len(df)
+        return df
+
+
+class ErrorAlarm:
+    """Debounced threshold alarm for one joint: fires once |err| stays above thresh for hold_s."""
+
+    def __init__(self, name: str, thresh: float = ERR_THRESH_DEG, hold_s: float = ALARM_HOLD_S):
+        self.name = name
+        self.thresh = thresh
+        self.hold_s = hold_s
+        self.over = False
+        self.since = None
+        self.active = False
+        self.count = 0
+
+    def _check(self, t_now, value, events):
+        if not self.active and self.since is not None and t_now - self.since >= self.hold_s:
+            self.active = True
+            self.count += 1
+            events.append(f"[ALARM] {self.name}: |err| > {self.thresh:g} deg for {t_now - self.since:.2f} s "
+                          f"(now {value:.2f})")
+
+    def update(self, t: np.ndarray, err: np.ndarray) -> list[str]:
+        events = []
+        if len(t) == 0:
+            return events
+        a = np.abs(np.nan_to_num(err, nan=0.0))
+        over = a > self.thresh
+        prev = np.concatenate(([self.over], over[:-1]))
+        for i in np.flatnonzero(over != prev):
+            if over[i]:
+                self.since = t[i]
+            else:
+                self._check(t[i], a[i - 1] if i else a[i], events)
+                if self.active:
+                    events.append(f"[CLEAR] {self.name}: back within {self.thresh:g} deg "
+                                  f"after {t[i] - self.since:.2f} s")
+                self.active = False
+                self.since = None
+        self.over = bool(over[-1])
+        if self.over:
+            self._check(t[-1], a[-1], events)
+        return events
+
+
+def follow(path: str | None = None, log_dir: str = LOG_DIR, thresh: float = ERR_THRESH_DEG,
+           hold_s: float = ALARM_HOLD_S, poll_s: float = FOLLOW_POLL_S, every_s: float = 5.0,
+           cal: dict | None = None):
+    """
+    Tail the active run log, keep running statistics and print alarms, until Ctrl+C.
+
+    Without an explicit path the newest segment is followed, and the tail
+    moves on when the logger rotates to a new one.
+    """
+    explicit = path is not None
+    path = path or find_latest_run(log_dir)
+    if path is None:
+        print(f"[ERROR] No run log found under: {log_dir}")
+        return
+    if strip_compress_ext(path) != path:
+        print(f"[ERROR] {path} is a closed, compressed segment; nothing to follow")
+        return
+
+    stats = RunErrorStats(thresh, cal=cal)
+    alarms = {j: ErrorAlarm(j.upper(), thresh, hold_s) for j in RunErrorStats.JOINTS}
+    tail = LogTail(path)
+    print(f"[OK] Following: {path}  (threshold {thresh:g} deg, hold {hold_s:g} s, Ctrl+C to stop)")
+    last_report = time.monotonic()
+    try:
+        while True:
+            df = tail.poll()
+            if df is not None and len(df):
+                stats.update(df)
+                t = pd.to_numeric(df["t"], errors="coerce").to_numpy(np.float64)
+                for j, alarm in alarms.items():
+                    err = joint_error(df, j)
+                    if err is not None:
+                        for msg in alarm.update(t, pd.to_numeric(err, errors="coerce").to_numpy(np.float64)):
+                            print(msg)
+            elif not explicit:
+                newest = latest_segment(log_dir)
+                if newest is not None and newest != tail.path and strip_compress_ext(newest) == newest:
+                    tail = LogTail(newest)
+                    print(f"[OK] Following: {newest}")
+
+            now = time.monotonic()
+            if now - last_report >= every_s:
+                last_report = now
+                parts = [f"{j.upper()} MAE={st.mae:.2f} P95={st.sketch.quantile(0.95):.2f}"
+                         for j, st in stats.joints.items() if st.n]
+                print(f"[LIVE] rows={stats.rows}  " + "  ".join(parts))
+            time.sleep(poll_s)
+    except KeyboardInterrupt:
+        pass
+    stats.print_summary()
+    print("  alarms: " + ", ".join(f"{a.name}={a.count}" for a in alarms.values()))
+
 
 def main():
-    latest = find_latest_run_csv(LOG_DIR)
+    ap = argparse.ArgumentParser(description="Validate a run log (newest under logs/ by default).")
+    ap.add_argument("path", nargs="?", default=None, help="run log to validate")
+    ap.add_argument("--stream", action="store_true",
+                    help=f"chunked summary in constant memory, no plots (automatic above {STREAM_AUTO_MB} MB)")
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per chunk in streaming mode")
+    ap.add_argument("--thresh", type=float, default=ERR_THRESH_DEG, help="error threshold, deg")
+    ap.add_argument("--fast", action="store_true",
+                    help=f"downsampled single-figure plots (automatic above {FAST_PLOT_ROWS} rows)")
+    ap.add_argument("--downsample", choices=("lttb", "minmax"), default="lttb", help="fast plots: decimation method")
+    ap.add_argument("--plot-jobs", type=int, default=0, help="fast plots: render per-joint figures in N processes")
+    ap.add_argument("--follow", action="store_true", help="tail the active run log and alarm on large errors")
+    ap.add_argument("--hold", type=float, default=ALARM_HOLD_S, help="follow: seconds above threshold before alarming")
+    ap.add_argument("--poll", type=float, default=FOLLOW_POLL_S, help="follow: poll interval, s")
+    ap.add_argument("--batch", action="store_true", help="validate many runs and report by strategy/mode")
+    ap.add_argument("--glob", default=None, help="batch: file pattern under logs/, e.g. 'run_202501*'")
+    ap.add_argument("--since", default=None, help="batch: 'YYYY-mm-dd[ HH:MM]' local time")
+    ap.add_argument("--until", default=None, help="batch: 'YYYY-mm-dd[ HH:MM]' local time")
+    ap.add_argument("--jobs", type=int, default=None, help="batch: worker processes (default: CPU count)")
+    args = ap.parse_args()
+    cal = load_calibration(CAL_PATH)
+
+    if args.follow:
+        follow(args.path, LOG_DIR, args.thresh, args.hold, args.poll, cal=cal)
+        return
+
+    if args.batch:
+        paths = list_runs(LOG_DIR, args.glob, _parse_when(args.since), _parse_when(args.until))
+        if not paths:
+            print(f"[ERROR] No matching run logs under: {LOG_DIR}")
+            return
+        batch_report(summarize_runs(paths, args.jobs, args.chunk, args.thresh, OUT_DIR, cal), OUT_DIR)
+        return
+
+    latest = args.path or find_latest_run(LOG_DIR)
     if latest is None:
-        print(f"[ERROR] No run_*.csv found under: {LOG_DIR}")
+        print(f"[ERROR] No run_*.csv / run_*{BIN_EXT} found under: {LOG_DIR}")
         print("Run the control program to generate logs first.")
         return
 
-    ensure_out_dir(OUT_DIR)
     print(f"[OK] Using latest log: {latest}")
 
-    df = pd.read_csv(latest)
+    if args.stream or os.path.getsize(latest) > STREAM_AUTO_MB * 1024 * 1024:
+        stream_summary(latest, args.chunk, args.thresh, cal=cal).print_summary()
+        return
+
+    ensure_out_dir(OUT_DIR)
+    df = load_run(latest)
 
-    # If your log includes a timestamp column, you can later switch x-axis to time.
-    save_target_vs_actual(df, OUT_DIR)
-    save_error_over_time(df, OUT_DIR)
-    print_summary(df)
+    if args.fast or len(df) > FAST_PLOT_ROWS:
+        save_fast_plots(df, OUT_DIR, args.downsample, PLOT_WIDTH_PX, args.plot_jobs)
+    else:
+        # If your log includes a timestamp column, you can later switch x-axis to time.
+        save_target_vs_actual(df, OUT_DIR)
+        save_error_over_time(df, OUT_DIR)
+    print_summary(df, cal)
 
     print(f"\n[OK] Plots saved to: {OUT_DIR}")
 
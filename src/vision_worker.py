@@ -0,0 +1,176 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# detector selection shared with the worker
+MODE_BOTH, MODE_MOTION, MODE_MARKER = 0, 1, 2
+_MODE_CODES = {None: MODE_BOTH, "MOTION": MODE_MOTION, "MARKER": MODE_MARKER}
+
+
+def _worker_main(shm_name, w, h, candidates, fps_limit, motion_kw, marker_kw,
+                 front, lock, seq, state, mode, results, stop):
+    """
+    Child process: capture, write into the back frame slot, detect, swap.
+
+    The parent only ever reads the front slot under `lock`, and the swap
+    takes the same lock, so a slot is never written while it is being read.
+    """
+    from .ui_kinematics import MotionDetector, MarkerTracker, open_camera
+
+    cap = open_camera(candidates, w, h)
+    if cap is None:
+        state.value = -1
+        return
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        slots = np.ndarray((2, h, w, 3), np.uint8, buffer=shm.buf)
+        motion = MotionDetector(w, h, **motion_kw)
+        marker = MarkerTracker(w, h, **marker_kw)
+        state.value = 1
+
+        import cv2
+        period = 1.0 / max(1, int(fps_limit))
+        last = 0.0
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                state.value = -2
+                return
+            ts = time.monotonic()
+            if ts - last < period:
+                continue
+            last = ts
+
+            back = 1 - front.value
+            dst = slots[back]
+            if frame.shape[0] == h and frame.shape[1] == w:
+                np.copyto(dst, frame)
+            else:
+                cv2.resize(frame, (w, h), dst=dst, interpolation=cv2.INTER_AREA)
+
+            m = mode.value
+            out = []
+            if m in (MODE_BOTH, MODE_MOTION):
+                c = motion.detect(dst)
+                out.append(("MOTION", c, ts, 0.0 if c is None else 1.0))
+            else:
+                motion.reset()
+            if m in (MODE_BOTH, MODE_MARKER):
+                c = marker.track(dst, ts)
+                out.append(("MARKER", c, ts, marker.conf))
+
+            with lock:
+                front.value = back
+                seq.value += 1
+            for r in out:
+                try:
+                    results.put_nowait(r)
+                except queue.Full:
+                    pass
+    finally:
+        cap.release()
+        del slots
+        shm.close()
+
+
+class VisionWorker:
+    """
+    Camera capture and motion/marker detection in a separate process.
+
+    Frames travel through a two-slot shared-memory buffer (for display only);
+    detections come back as (kind, (cx, cy) or None, t_monotonic, conf)
+    tuples through a small queue. Detector cost therefore runs on another
+    core and never stretches the UI frame.
+    """
+
+    def __init__(self, w, h, candidates, fps_limit=25, motion_kw=None, marker_kw=None):
+        self.w, self.h = int(w), int(h)
+        ctx = mp.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=2 * self.h * self.w * 3)
+        self.slots = np.ndarray((2, self.h, self.w, 3), np.uint8, buffer=self.shm.buf)
+        self.slots.fill(0)
+
+        self.front = ctx.Value("i", 0, lock=False)
+        self.seq = ctx.Value("q", 0, lock=False)
+        self.state = ctx.Value("i", 0, lock=False)     # 0 starting, 1 running, <0 failed
+        self.mode = ctx.Value("i", MODE_BOTH, lock=False)
+        self.lock = ctx.Lock()
+        self.results = ctx.Queue(maxsize=64)
+        self.stop_evt = ctx.Event()
+
+        self.frames = 0
+        self.fps = 0.0
+        self._seen_seq = 0
+        self._fps_t = time.monotonic()
+        self._fps_n = 0
+
+        self.proc = ctx.Process(
+            target=_worker_main,
+            args=(self.shm.name, self.w, self.h, list(candidates), fps_limit,
+                  motion_kw or {}, marker_kw or {},
+                  self.front, self.lock, self.seq, self.state, self.mode, self.results, self.stop_evt),
+            name="vision-worker", daemon=True,
+        )
+        self.proc.start()
+
+    def wait_ready(self, timeout=10.0):
+        """Block until the worker has a camera open; False if it failed or timed out."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.state.value != 0:
+                return self.state.value == 1
+            if not self.proc.is_alive():
+                return False
+            time.sleep(0.01)
+        return False
+
+    def alive(self):
+        return self.state.value == 1 and self.proc.is_alive()
+
+    def set_mode(self, mode):
+        self.mode.value = _MODE_CODES.get(mode, MODE_BOTH)
+
+    def poll(self):
+        """Return all detection results received since the last call."""
+        out = []
+        while True:
+            try:
+                out.append(self.results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def read_frame(self, consume):
+        """Call consume(frame) with the newest frame if there is one; the slot is held for the call."""
+        if self.seq.value == self._seen_seq:
+            return False
+        with self.lock:
+            self._seen_seq = self.seq.value
+            consume(self.slots[self.front.value])
+        now = time.monotonic()
+        if self.frames == 0:
+            self._fps_t = now
+        self.frames += 1
+        self._fps_n += 1
+        if now - self._fps_t >= 1.0:
+            self.fps = self._fps_n / (now - self._fps_t)
+            self._fps_t, self._fps_n = now, 0
+        return True
+
+    def stats_text(self):
+        return f"CAM[proc] {self.fps:4.1f} fps  frames={self.frames}"
+
+    def stop(self, timeout=2.0):
+        self.stop_evt.set()
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        del self.slots
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass